@@ -0,0 +1,85 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from comic_app.strip_fetcher import FetchCancelled, download_failed, download_image, resolve_image_url
+
+POLL_MS = 50
+PROGRESS_STEP = 64 * 1024
+
+class AsyncFetcher:
+    def __init__(self, root, max_workers=2):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="comic-fetch")
+        self.results = queue.Queue()
+        self.active = None
+        self.polling = False
+
+    def fetch(self, comic_url, comic_date, file_path, on_progress, on_done, on_url_failure, on_error):
+        # Only one fetch is live at a time, starting another cancels the previous one
+        self.cancel()
+        cancel_event = threading.Event()
+        future = self.executor.submit(self._run, cancel_event, comic_url, comic_date, file_path,
+                                      on_progress, on_done, on_url_failure, on_error)
+        self.active = (cancel_event, future)
+        self._start_polling()
+
+    def cancel(self):
+        if self.active:
+            cancel_event, future = self.active
+            cancel_event.set()
+            future.cancel()
+            self.active = None
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, cancel_event, comic_url, comic_date, file_path, on_progress, on_done, on_url_failure, on_error):
+        def post(callback, *args):
+            if not cancel_event.is_set():
+                self.results.put((cancel_event, callback, args))
+
+        last_reported = [0]
+        def progress(received, total):
+            if received - last_reported[0] >= PROGRESS_STEP or received == total:
+                last_reported[0] = received
+                post(on_progress, received, total)
+
+        try:
+            image_url = resolve_image_url(comic_url, comic_date)
+            if cancel_event.is_set():
+                return
+            if not image_url:
+                post(on_url_failure)
+                return
+            try:
+                download_image(image_url, file_path, progress, cancel_event.is_set)
+            except Exception as e:
+                download_failed(comic_url, comic_date, e)
+                raise
+            post(on_done, file_path)
+        except FetchCancelled:
+            pass
+        except Exception as e:
+            post(on_error, e)
+
+    def _start_polling(self):
+        if not self.polling:
+            self.polling = True
+            self.root.after(POLL_MS, self._poll)
+
+    def _poll(self):
+        # Results are handed back to the Tk thread here, widgets must not be touched from the workers
+        while True:
+            try:
+                cancel_event, callback, args = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if not cancel_event.is_set():
+                callback(*args)
+
+        if (self.active and not self.active[1].done()) or not self.results.empty():
+            self.root.after(POLL_MS, self._poll)
+        else:
+            self.polling = False
@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from urllib.parse import urlparse
+import requests
+
+from comic_app.cli import add_settings_argument, find_comic, load_settings, open_comic_index
+from comic_app.comic_index import ComicIndex
+from comic_app.http_client import configure_client
+from comic_app.strip_fetcher import FetchCancelled, configure_url_cache, download_failed, download_image, is_recent, parser_available, resolve_image_url
+from comic_app.url_cache import URL_CACHE_FILE, DEFAULT_NEGATIVE_TTL
+
+# Rate limit key for page scrapes, the parser does not expose which host it talks to
+RESOLVE_HOST = "image-url-parser"
+
+class HostRateLimiter:
+    def __init__(self, requests_per_second=1.0):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class Backfill:
+    def __init__(self, comic, start_date, end_date, folder_path, state_dir="", comic_index=None,
+                 max_workers=4, retries=3, backoff=2.0, requests_per_second=1.0, retry_unavailable=False, progress=None):
+        self.comic = comic
+        self.start_date = start_date
+        # Future dates have nothing to fetch yet
+        self.end_date = min(end_date, date.today())
+        self.folder_path = folder_path
+        self.state_path = os.path.join(state_dir, f"backfill_{comic['short_code']}.json")
+        self.comic_index = comic_index or ComicIndex(folder_path)
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.retry_unavailable = retry_unavailable
+        self.progress = progress
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.counts = {"total": 0, "fetched": 0, "unavailable": 0, "failed": 0}
+        self.state = self.load_state()
+
+    def load_state(self):
+        # Dates known to have no strip are not probed again on the next run
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r') as f:
+                    state = json.load(f)
+                return {"unavailable": set(state.get("unavailable", []))}
+            except (OSError, ValueError) as e:
+                print(f"Ignoring backfill state {self.state_path}: {e}")
+        return {"unavailable": set()}
+
+    def save_state(self):
+        with self.lock:
+            state = {"comic": self.comic["name"], "unavailable": sorted(self.state["unavailable"])}
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    def missing_dates(self):
+        missing = []
+        comic_date = self.start_date
+        while comic_date <= self.end_date:
+            if (self.comic_index.lookup(self.comic["short_code"], comic_date) is None
+                    and (self.retry_unavailable or is_recent(comic_date)
+                         or comic_date.toordinal() not in self.state["unavailable"])):
+                missing.append(comic_date)
+            comic_date += timedelta(days=1)
+        return missing
+
+    def run(self):
+        if not parser_available:
+            raise RuntimeError("Image URL parser is not available, cannot backfill")
+        os.makedirs(self.folder_path, exist_ok=True)
+        missing = self.missing_dates()
+        self.counts["total"] = len(missing)
+        self.report()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="comic-backfill") as executor:
+            futures = [executor.submit(self.fetch_date, comic_date) for comic_date in missing]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                # Let queued dates drain without fetching so the executor can shut down
+                self.stop()
+                raise
+        self.save_state()
+        return self.counts
+
+    def stop(self):
+        self.stop_event.set()
+
+    def fetch_date(self, comic_date):
+        if self.stop_event.is_set():
+            return
+        date_str = comic_date.strftime("%y%m%d")
+        file_path = os.path.join(self.folder_path, f"{self.comic['short_code']}{date_str}.jpg")
+
+        for attempt in range(self.retries + 1):
+            try:
+                self.rate_limiter.wait(RESOLVE_HOST)
+                image_url = resolve_image_url(self.comic["url"], comic_date)
+                if not image_url:
+                    self.record(comic_date, "unavailable")
+                    return
+                self.rate_limiter.wait(urlparse(image_url).hostname or "")
+                download_image(image_url, file_path, cancelled=self.stop_event.is_set)
+                self.comic_index.add(file_path)
+                self.record(comic_date, "fetched")
+                return
+            except FetchCancelled:
+                return
+            except requests.HTTPError as e:
+                download_failed(self.comic["url"], comic_date, e)
+                error = e
+            except Exception as e:
+                error = e
+            if self.stop_event.is_set():
+                return
+            if attempt < self.retries:
+                time.sleep(self.backoff * (2 ** attempt) + random.uniform(0, self.backoff))
+
+        print(f"Backfill of {self.comic['name']} {comic_date} failed: {error}")
+        self.record(comic_date, "failed")
+
+    def record(self, comic_date, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+            # Recent dates are probed again on the next run, their strip may not be published yet
+            if outcome == "unavailable" and not is_recent(comic_date):
+                self.state["unavailable"].add(comic_date.toordinal())
+            finished = self.counts["fetched"] + self.counts["unavailable"] + self.counts["failed"]
+        # Checkpoint regularly so an interrupted backfill resumes close to where it stopped
+        if finished % 25 == 0:
+            self.save_state()
+        self.report()
+
+    def report(self):
+        if self.progress:
+            with self.lock:
+                counts = dict(self.counts)
+            self.progress(counts)
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def main():
+    parser = argparse.ArgumentParser(description="Download every missing strip of a comic in a date range.")
+    parser.add_argument("comic", help="Comic name as shown in the viewer")
+    parser.add_argument("start", type=parse_date, help="First date, YYYY-MM-DD")
+    parser.add_argument("end", type=parse_date, nargs="?", default=date.today(), help="Last date, YYYY-MM-DD (default: today)")
+    add_settings_argument(parser)
+    parser.add_argument("--workers", type=int, default=4, help="Parallel downloads")
+    parser.add_argument("--rate", type=float, default=1.0, help="Requests per second per host")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per date")
+    parser.add_argument("--retry-unavailable", action="store_true", help="Probe dates a previous run found no strip for")
+    args = parser.parse_args()
+
+    settings, settings_dir = load_settings(args)
+    configure_client(settings)
+    configure_url_cache(os.path.join(settings_dir, URL_CACHE_FILE), settings.get("url_negative_ttl", DEFAULT_NEGATIVE_TTL))
+    comic = find_comic(parser, settings, args.comic)
+    folder_path = settings["folder_path"]
+    comic_index = open_comic_index(settings, settings_dir)
+
+    def progress(counts):
+        finished = counts["fetched"] + counts["unavailable"] + counts["failed"]
+        print(f"\r{finished}/{counts['total']} dates, {counts['fetched']} fetched, "
+              f"{counts['unavailable']} unavailable, {counts['failed']} failed", end="", flush=True)
+
+    backfill = Backfill(comic, args.start, args.end, folder_path, settings_dir, comic_index,
+                        max_workers=args.workers, retries=args.retries, requests_per_second=args.rate,
+                        retry_unavailable=args.retry_unavailable, progress=progress)
+    try:
+        backfill.run()
+    except KeyboardInterrupt:
+        backfill.stop()
+        backfill.save_state()
+        print("\nInterrupted, progress saved.")
+    else:
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+
+from comic_app.comic_index import parse_file_name
+
+# Lives inside the comics folder, the leading dot keeps it out of the flat <short_code><yymmdd> scan
+STORE_DIR = '.store'
+MANIFEST_FILE = 'manifest.db'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_store_path(relative_path):
+    return os.path.normpath(relative_path).split(os.sep)[0] == STORE_DIR
+
+class BlobStore:
+    # Strips kept once per distinct content under .store/objects/ab/cd/<sha256>.<ext>,
+    # the manifest maps (short_code, date) to a blob so reruns and repeats share one file
+    def __init__(self, folder_path, store_dir=STORE_DIR):
+        self.folder_path = folder_path
+        self.objects_dir = os.path.join(store_dir, 'objects')
+        self.manifest_path = os.path.join(folder_path, store_dir, MANIFEST_FILE)
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(folder_path, self.objects_dir), exist_ok=True)
+        self.connection = sqlite3.connect(self.manifest_path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS strip ("
+                " short_code TEXT NOT NULL,"
+                " ordinal INTEGER NOT NULL,"
+                " blob TEXT NOT NULL,"
+                " PRIMARY KEY (short_code, ordinal)) WITHOUT ROWID"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS strip_blob ON strip (blob)")
+
+    def relative_path(self, blob):
+        # Blob names use '/' in the manifest, paths handed out are relative to the comics folder
+        return os.path.join(self.objects_dir, *blob.split('/'))
+
+    def mtime(self):
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def entries(self):
+        # (short_code, ordinal, ext, path relative to the comics folder) for every stored strip
+        with self.lock:
+            rows = self.connection.execute("SELECT short_code, ordinal, blob FROM strip").fetchall()
+        return [(short_code, ordinal, blob.rsplit('.', 1)[-1], self.relative_path(blob)) for short_code, ordinal, blob in rows]
+
+    def put(self, file_path, short_code, ordinal, ext):
+        # Moves file_path into the store and records it for (short_code, ordinal), returns the relative blob path
+        return self._put(file_path, short_code, ordinal, ext)[0]
+
+    def _put(self, file_path, short_code, ordinal, ext):
+        digest = file_digest(file_path)
+        blob = f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+        blob_path = os.path.join(self.folder_path, self.relative_path(blob))
+
+        with self.lock:
+            duplicate = os.path.exists(blob_path)
+            if duplicate:
+                # Same bytes are already stored for another date
+                os.remove(file_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(file_path, blob_path)
+            with self.connection:
+                row = self.connection.execute(
+                    "SELECT blob FROM strip WHERE short_code = ? AND ordinal = ?", (short_code, ordinal)
+                ).fetchone()
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO strip (short_code, ordinal, blob) VALUES (?, ?, ?)", (short_code, ordinal, blob)
+                )
+            if row and row[0] != blob:
+                self._collect(row[0])
+        return self.relative_path(blob), duplicate
+
+    def release(self, short_code, ordinal):
+        # Forget a strip, its blob is deleted once no other date refers to it
+        with self.lock:
+            with self.connection:
+                row = self.connection.execute(
+                    "SELECT blob FROM strip WHERE short_code = ? AND ordinal = ?", (short_code, ordinal)
+                ).fetchone()
+                if row is None:
+                    return False
+                self.connection.execute("DELETE FROM strip WHERE short_code = ? AND ordinal = ?", (short_code, ordinal))
+            self._collect(row[0])
+        return True
+
+    def _collect(self, blob):
+        # Caller must hold self.lock
+        if self.connection.execute("SELECT 1 FROM strip WHERE blob = ? LIMIT 1", (blob,)).fetchone():
+            return
+        try:
+            os.remove(os.path.join(self.folder_path, self.relative_path(blob)))
+        except FileNotFoundError:
+            pass
+
+    def ingest(self, progress=None):
+        # Move every flat <short_code><yymmdd> file of the comics folder into the store
+        counts = {"files": 0, "bytes": 0, "deduplicated": 0, "bytes_saved": 0}
+        files = []
+        with os.scandir(self.folder_path) as folder:
+            for entry in folder:
+                parsed = parse_file_name(entry.name)
+                if parsed and entry.is_file():
+                    files.append((entry.path, parsed, entry.stat().st_size))
+
+        for file_path, parsed, size in files:
+            _, duplicate = self._put(file_path, *parsed)
+            counts["files"] += 1
+            counts["bytes"] += size
+            if duplicate:
+                counts["deduplicated"] += 1
+                counts["bytes_saved"] += size
+            if progress:
+                progress(counts)
+        return counts
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+def open_blob_store(folder_path, settings):
+    # The content store is opt-in, once a folder has been ingested it stays in use
+    if not settings.get("content_store", False) and not os.path.exists(os.path.join(folder_path, STORE_DIR, MANIFEST_FILE)):
+        return None
+    return BlobStore(folder_path)
+
+def main():
+    # Imported here, comic_app.cli opens stores through this module
+    from comic_app.cli import add_settings_argument, load_settings, open_comic_index, rebuild_index_cache
+
+    parser = argparse.ArgumentParser(description="Move the flat comics folder into the content-addressed store.")
+    add_settings_argument(parser)
+    args = parser.parse_args()
+
+    settings, settings_dir = load_settings(args)
+    blob_store = BlobStore(settings["folder_path"])
+
+    def progress(counts):
+        print(f"\r{counts['files']} files, {counts['deduplicated']} duplicates", end="", flush=True)
+
+    counts = blob_store.ingest(progress)
+    print(f"\nStored {counts['files']} files ({counts['bytes'] // 1024} KB), "
+          f"{counts['deduplicated']} duplicates saved {counts['bytes_saved'] // 1024} KB")
+
+    rebuild_index_cache(open_comic_index(settings, settings_dir, blob_store))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import os
+
+from comic_app.blob_store import open_blob_store
+from comic_app.comic_index import ComicIndex, INDEX_CACHE_FILE
+from comic_app.settings_manager import SettingsManager, SETTINGS_FILE
+
+# Shared setup for the python -m comic_app.<command> tools, they work on the same folder and caches as the viewers
+
+def add_settings_argument(parser):
+    parser.add_argument("--settings", default=os.path.join(os.getenv('COMIC_SETTINGS_PATH', ''), SETTINGS_FILE), help="Path to settings.json")
+
+def load_settings(args):
+    # Returns (settings, settings directory), caches and state files live next to settings.json
+    return SettingsManager(args.settings).settings, os.path.dirname(args.settings)
+
+def find_comic(parser, settings, name):
+    comic = next((comic for comic in settings["comics"] if comic["name"] == name), None)
+    if comic is None:
+        parser.error(f"Unknown comic: {name}")
+    return comic
+
+def open_comic_index(settings, settings_dir, blob_store=None):
+    folder_path = settings["folder_path"]
+    return ComicIndex(folder_path, cache_path=os.path.join(settings_dir, INDEX_CACHE_FILE),
+                      blob_store=blob_store or open_blob_store(folder_path, settings))
+
+def rebuild_index_cache(comic_index):
+    # After moving strips around, so the viewers pick the change up without a full rescan on start
+    comic_index.refresh(force=True)
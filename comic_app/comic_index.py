@@ -0,0 +1,325 @@
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime
+
+from comic_app.strip_packs import PACK_PATTERN, pack_members, split_pack_path
+
+# <short_code><yymmdd>.<ext>, e.g. ft240625.jpg
+FILE_PATTERN = re.compile(r'^(?P<short_code>.+?)(?P<date>\d{6})\.(?P<ext>jpg|png|bmp)$', re.IGNORECASE)
+
+# When several exist for a date the .jpg wins, matching the old os.path.exists probe order.
+# .png is what BMPs are transcoded to, so it ranks above the BMP it replaces.
+EXTENSION_PRIORITY = {"jpg": 0, "png": 1, "bmp": 2}
+
+INDEX_CACHE_FILE = 'comic_index.json'
+INDEX_CACHE_VERSION = 3
+
+def parse_file_name(file_name):
+    match = FILE_PATTERN.match(file_name)
+    if not match:
+        return None
+    try:
+        comic_date = datetime.strptime(match.group("date"), "%y%m%d").date()
+    except ValueError:
+        return None
+    return match.group("short_code"), comic_date.toordinal(), match.group("ext").lower()
+
+def logical_name(short_code, ordinal, ext):
+    return f"{short_code}{date.fromordinal(ordinal).strftime('%y%m%d')}.{ext}"
+
+class ComicIndex:
+    def __init__(self, folder_path, refresh_interval=2.0, cache_path=None, blob_store=None):
+        self.folder_path = folder_path
+        self.refresh_interval = refresh_interval
+        self.cache_path = cache_path
+        self.blob_store = blob_store
+        self.lock = threading.RLock()
+        # (short_code, ordinal) -> file name (or blob path relative to the folder), and short_code -> sorted ordinals
+        self.entries = {}
+        self.dates = {}
+        self.folder_mtime = None
+        self.last_check = 0
+        # Set while a scan runs outside the lock, collects this process's own changes to replay onto its result
+        self.scanning = False
+        self.journal = None
+        self.load_cache()
+        self.refresh(force=self.folder_mtime is None)
+
+    def refresh(self, force=False):
+        # A stat of the folder itself is enough to notice files being added, removed or renamed.
+        # The scan runs outside the lock, lookups keep answering from the previous state meanwhile.
+        now = time.monotonic()
+        with self.lock:
+            if self.scanning or (not force and now - self.last_check < self.refresh_interval):
+                return
+            self.last_check = now
+            self.scanning = True
+        try:
+            try:
+                folder_mtime = self.stamp()
+            except OSError:
+                with self.lock:
+                    self.entries, self.dates, self.folder_mtime = {}, {}, None
+                return
+            with self.lock:
+                if not force and folder_mtime == self.folder_mtime:
+                    return
+                self.journal = []
+
+            entries, dates = self.scan()
+
+            with self.lock:
+                # Files this process added or removed while the scan ran may be missing from its listing
+                for change in self.journal:
+                    self._apply(entries, dates, *change)
+                self.entries = entries
+                self.dates = dates
+                self.folder_mtime = folder_mtime
+        finally:
+            with self.lock:
+                self.scanning = False
+                self.journal = None
+        self.save_cache()
+
+    def stamp(self):
+        # A stat of the folder itself is enough to notice flat files changing, the store changes its manifest
+        folder_mtime = os.stat(self.folder_path).st_mtime_ns
+        return [folder_mtime, self.blob_store.mtime() if self.blob_store else None]
+
+    def scan(self):
+        # Returns (entries, dates) for the folder as it is now, without touching the index
+        entries = {}
+        packs = []
+        with os.scandir(self.folder_path) as folder:
+            for entry in folder:
+                parsed = parse_file_name(entry.name)
+                if parsed and entry.is_file():
+                    self._store(entries, parsed, entry.name)
+                elif PACK_PATTERN.match(entry.name) and entry.is_file():
+                    packs.append(entry.name)
+        # Flat files come first so a strip downloaded after packing wins over the packed copy
+        for pack in packs:
+            try:
+                members = pack_members(os.path.join(self.folder_path, pack))
+            except (OSError, zipfile.BadZipFile) as e:
+                print(f"Skipping unreadable pack {pack}: {e}")
+                continue
+            for member in members:
+                parsed = parse_file_name(member)
+                if parsed:
+                    self._store(entries, parsed, os.path.join(pack, member))
+        if self.blob_store:
+            for short_code, ordinal, ext, relative_path in self.blob_store.entries():
+                self._store(entries, (short_code, ordinal, ext), relative_path)
+
+        dates = {}
+        for short_code, ordinal in entries:
+            dates.setdefault(short_code, []).append(ordinal)
+        for ordinals in dates.values():
+            ordinals.sort()
+
+        return entries, dates
+
+    def _is_blob(self, file_name):
+        return self.blob_store is not None and file_name.startswith(self.blob_store.objects_dir)
+
+    def _store(self, entries, parsed, file_name):
+        short_code, ordinal, ext = parsed
+        current = entries.get((short_code, ordinal))
+        if current is None or EXTENSION_PRIORITY[ext] < EXTENSION_PRIORITY[current[-3:].lower()]:
+            entries[(short_code, ordinal)] = file_name
+            return current is None
+        return False
+
+    def load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r') as f:
+                cache = json.load(f)
+            if cache.get("version") != INDEX_CACHE_VERSION or cache.get("folder_path") != self.folder_path:
+                return
+            if cache.get("folder_mtime") != self.stamp():
+                return
+            entries = {}
+            dates = {}
+            for short_code, files in cache["comics"].items():
+                dates[short_code] = [ordinal for ordinal, _ in files]
+                for ordinal, file_name in files:
+                    entries[(short_code, ordinal)] = file_name
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring comic index cache: {e}")
+            return
+
+        with self.lock:
+            self.entries = entries
+            self.dates = dates
+            self.folder_mtime = cache["folder_mtime"]
+            self.last_check = time.monotonic()
+
+    def save_cache(self):
+        if not self.cache_path:
+            return
+        with self.lock:
+            cache = {
+                "version": INDEX_CACHE_VERSION,
+                "folder_path": self.folder_path,
+                "folder_mtime": self.folder_mtime,
+                "comics": {short_code: [[ordinal, self.entries[(short_code, ordinal)]] for ordinal in ordinals]
+                           for short_code, ordinals in self.dates.items()}
+            }
+        try:
+            cache_dir = os.path.dirname(self.cache_path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f"{self.cache_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(cache, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"Error saving comic index cache: {e}")
+
+    def _path(self, short_code, ordinal):
+        return os.path.join(self.folder_path, self.entries[(short_code, ordinal)])
+
+    def lookup(self, short_code, comic_date):
+        self.refresh()
+        with self.lock:
+            file_name = self.entries.get((short_code, comic_date.toordinal()))
+        return os.path.join(self.folder_path, file_name) if file_name else None
+
+    def latest(self, short_code):
+        self.refresh()
+        return self._at(short_code, -1)
+
+    def earliest(self, short_code):
+        self.refresh()
+        return self._at(short_code, 0)
+
+    def next_date(self, short_code, comic_date):
+        # First available strip strictly after comic_date
+        self.refresh()
+        with self.lock:
+            ordinals = self.dates.get(short_code, [])
+            position = bisect_right(ordinals, comic_date.toordinal())
+            return self._at(short_code, position) if position < len(ordinals) else None
+
+    def previous_date(self, short_code, comic_date):
+        # Last available strip strictly before comic_date
+        self.refresh()
+        with self.lock:
+            ordinals = self.dates.get(short_code, [])
+            position = bisect_left(ordinals, comic_date.toordinal())
+            return self._at(short_code, position - 1) if position > 0 else None
+
+    def short_codes(self):
+        self.refresh()
+        with self.lock:
+            return sorted(self.dates)
+
+    def dates_between(self, short_code, start_date, end_date):
+        # Every available strip from start_date to end_date inclusive, as (date, file path) in date order
+        self.refresh()
+        with self.lock:
+            ordinals = self.dates.get(short_code, [])
+            first = bisect_left(ordinals, start_date.toordinal())
+            last = bisect_right(ordinals, end_date.toordinal())
+            return [(date.fromordinal(ordinal), self._path(short_code, ordinal)) for ordinal in ordinals[first:last]]
+
+    def _at(self, short_code, position):
+        with self.lock:
+            ordinals = self.dates.get(short_code)
+            if not ordinals:
+                return None
+            ordinal = ordinals[position]
+            return date.fromordinal(ordinal), self._path(short_code, ordinal)
+
+    def add(self, file_path):
+        # Register a file written by this process without waiting for the next folder check,
+        # returns the path the strip ends up at (inside the content store when there is one)
+        file_name = os.path.basename(file_path)
+        parsed = parse_file_name(file_name)
+        if not parsed:
+            return file_path
+        if self.blob_store:
+            file_name = self.blob_store.put(file_path, *parsed)
+            file_path = os.path.join(self.folder_path, file_name)
+        with self.lock:
+            self._change("add", parsed, file_name)
+        return file_path
+
+    def remove(self, file_path):
+        file_name = os.path.basename(file_path)
+        parsed = parse_file_name(file_name)
+        if not parsed:
+            return
+        short_code, ordinal, ext = parsed
+        with self.lock:
+            if self.entries.get((short_code, ordinal)) != file_name:
+                return
+            self._change("remove", parsed, file_name)
+
+            # The same strip may still be on disk with the other extension
+            base_path = os.path.splitext(file_path)[0]
+            for other_ext in EXTENSION_PRIORITY:
+                if other_ext != ext and os.path.exists(f"{base_path}.{other_ext}"):
+                    self.add(f"{base_path}.{other_ext}")
+
+    def delete(self, short_code, comic_date):
+        # Delete a strip from disk and the index, a stored blob goes once no other date shares it
+        self.refresh()
+        ordinal = comic_date.toordinal()
+        with self.lock:
+            file_name = self.entries.get((short_code, ordinal))
+            if file_name is None:
+                return False
+            if not self._is_blob(file_name):
+                file_path = self._path(short_code, ordinal)
+                if split_pack_path(file_path):
+                    raise ValueError(f"{file_name} is inside a pack, unpack it to delete single strips")
+                os.remove(file_path)
+                self.remove(file_path)
+                return True
+            self.blob_store.release(short_code, ordinal)
+            self._change("remove", (short_code, ordinal, file_name[-3:].lower()), file_name)
+            return True
+
+    def _change(self, action, parsed, file_name):
+        # Caller must hold self.lock. Applies a change made by this process right away. The folder stamp is left
+        # alone, other processes may have written to the folder too and the next refresh has to scan for those.
+        self._apply(self.entries, self.dates, action, parsed, file_name)
+        if self.journal is not None:
+            self.journal.append((action, parsed, file_name))
+
+    def _apply(self, entries, dates, action, parsed, file_name):
+        key = parsed[:2]
+        if action == "remove":
+            if entries.get(key) == file_name:
+                del entries[key]
+                dates[parsed[0]].remove(parsed[1])
+            return
+        current = entries.get(key)
+        if current is not None and self._is_blob(current):
+            # A strip stored again replaces its previous blob, which the store has already dropped
+            entries[key] = file_name
+        elif self._store(entries, parsed, file_name):
+            insort(dates.setdefault(parsed[0], []), parsed[1])
+
+    def served_name(self, short_code, comic_date, file_path):
+        # The <short_code><yymmdd>.<ext> name the strip of comic_date is served under. One blob can hold
+        # the strip of several dates, so for the store the name comes from the date, not from the file.
+        if self._is_blob(os.path.relpath(file_path, self.folder_path)):
+            return logical_name(short_code, comic_date.toordinal(), file_path[-3:].lower())
+        return os.path.basename(file_path)
+
+    def resolve_name(self, file_name):
+        # Path of the strip behind a <short_code><yymmdd>.<ext> name, wherever it is kept
+        parsed = parse_file_name(file_name)
+        if not parsed:
+            return None
+        return self.lookup(parsed[0], date.fromordinal(parsed[1]))
@@ -20,8 +20,13 @@ class ComicManager:
             self.callback()
 
     def load_comic_details(self, comic_name):
+        comic = self.get_comic(comic_name)
+        if comic:
+            self.selected_comic = comic
+        return comic
+
+    def get_comic(self, comic_name):
         for comic in self.comics:
             if comic['name'] == comic_name:
-                self.selected_comic = comic
                 return comic
         return None
@@ -9,29 +9,29 @@ class DateNavigator:
     def next_day(self, event=None):
         new_date = self.date_selector.get_date() + timedelta(days=1)
         self.date_selector.set_date(new_date)
-        self.comic_viewer.find_comic()
+        self.comic_viewer.find_comic(direction=1)
 
     def previous_day(self, event=None):
         new_date = self.date_selector.get_date() - timedelta(days=1)
         self.date_selector.set_date(new_date)
-        self.comic_viewer.find_comic()
+        self.comic_viewer.find_comic(direction=-1)
 
     def next_week(self, event=None):
         new_date = self.date_selector.get_date() + timedelta(weeks=1)
         self.date_selector.set_date(new_date)
-        self.comic_viewer.find_comic()
+        self.comic_viewer.find_comic(direction=1)
 
     def previous_week(self, event=None):
         new_date = self.date_selector.get_date() - timedelta(weeks=1)
         self.date_selector.set_date(new_date)
-        self.comic_viewer.find_comic()
+        self.comic_viewer.find_comic(direction=-1)
 
     def next_month(self):
         new_date = self.date_selector.get_date() + relativedelta(months=1)
         self.date_selector.set_date(new_date)
-        self.comic_viewer.find_comic()
+        self.comic_viewer.find_comic(direction=1)
 
     def previous_month(self):
         new_date = self.date_selector.get_date() - relativedelta(months=1)
         self.date_selector.set_date(new_date)
-        self.comic_viewer.find_comic()
+        self.comic_viewer.find_comic(direction=-1)
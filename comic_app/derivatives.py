@@ -0,0 +1,160 @@
+import os
+import threading
+from PIL import Image
+
+from comic_app.strip_fetcher import atomic_write
+from comic_app.strip_packs import strip_source, strip_stat
+
+# Widths the web UI may ask for, requests are snapped up to the next bucket so browsers share cache entries
+WIDTH_BUCKETS = (480, 800, 1200, 1600, 2400)
+
+# format name -> (Pillow format, mimetype, file extension, save options)
+FORMATS = {
+    "avif": ("AVIF", "image/avif", "avif", {"quality": 60}),
+    "webp": ("WEBP", "image/webp", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", "jpg", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+# evict() trims the cache down to this share of its budget
+EVICT_TARGET = 0.9
+
+def supported_formats():
+    # AVIF needs a Pillow build with libavif, WebP needs libwebp, JPEG is always there
+    Image.init()
+    return [name for name, (pil_format, _, _, _) in FORMATS.items() if pil_format in Image.SAVE]
+
+def snap_width(width):
+    for bucket in WIDTH_BUCKETS:
+        if width <= bucket:
+            return bucket
+    return WIDTH_BUCKETS[-1]
+
+def negotiate_format(accept_header, requested=None):
+    formats = supported_formats()
+    if requested in formats:
+        return requested
+    for name in ("avif", "webp"):
+        if name in formats and FORMATS[name][1] in (accept_header or ""):
+            return name
+    return "jpeg"
+
+def write_derivative(source_path, file_path, width, format_name):
+    # Module level so a process pool can run it, returns the size of the written file
+    with Image.open(strip_source(source_path)) as image:
+        if image.width > width:
+            # Let JPEG decode at a reduced scale, only possible before the image is loaded
+            image.draft("RGB", (width, max(1, round(image.height * width / image.width))))
+        return save_derivative(image, file_path, width, format_name)
+
+def save_derivative(image, file_path, width, format_name):
+    # Resize an opened image and write it atomically, callers producing several sizes decode the strip once
+    pil_format, _, _, options = FORMATS[format_name]
+    if image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    with atomic_write(file_path) as temp_file:
+        image.save(temp_file, pil_format, **options)
+    return os.path.getsize(file_path)
+
+class DerivativeCache:
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.is_file())
+
+    def path_for(self, source_path, width, format_name):
+        # Keyed by the source's name and mtime, a replaced strip gets a fresh derivative
+        source_mtime = strip_stat(source_path).st_mtime_ns
+        stem = os.path.splitext(os.path.basename(source_path))[0]
+        return os.path.join(self.cache_dir, f"{stem}.{width}.{source_mtime}.{FORMATS[format_name][2]}")
+
+    def get(self, source_path, width, format_name):
+        # Returns the path of the derivative, generating it on first request
+        file_path = self.path_for(source_path, width, format_name)
+        if self.touch(file_path):
+            return file_path
+
+        lock = self.key_lock(file_path)
+        try:
+            with lock:
+                # Another request may have written it while this one waited
+                if self.touch(file_path):
+                    return file_path
+                size = write_derivative(source_path, file_path, width, format_name)
+        finally:
+            with self.lock:
+                if self.key_locks.get(file_path) is lock:
+                    del self.key_locks[file_path]
+
+        with self.lock:
+            self.size += size
+        self.evict()
+        return file_path
+
+    def touch(self, file_path):
+        # mtime doubles as last-access time for eviction, False when the derivative is not there
+        try:
+            os.utime(file_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def get_many(self, source_paths, width, format_name, executor):
+        # Generates every missing derivative on executor (a process pool), returns {source path: derivative path}
+        results = {}
+        futures = {}
+        for source_path in source_paths:
+            try:
+                file_path = self.path_for(source_path, width, format_name)
+            except OSError as e:
+                print(f"Skipping {source_path}: {e}")
+                continue
+            if self.touch(file_path):
+                results[source_path] = file_path
+            else:
+                futures[executor.submit(write_derivative, source_path, file_path, width, format_name)] = (source_path, file_path)
+
+        for future, (source_path, file_path) in futures.items():
+            try:
+                size = future.result()
+            except Exception as e:
+                print(f"Error generating {file_path}: {e}")
+                continue
+            with self.lock:
+                self.size += size
+            results[source_path] = file_path
+        if futures:
+            self.evict()
+        return results
+
+    def key_lock(self, file_path):
+        # Concurrent requests for the same derivative wait for one encoder instead of each running their own
+        with self.lock:
+            lock = self.key_locks.get(file_path)
+            if lock is None:
+                lock = self.key_locks[file_path] = threading.Lock()
+            return lock
+
+    def evict(self):
+        with self.lock:
+            if self.size <= self.max_bytes:
+                return
+            entries = sorted((entry for entry in os.scandir(self.cache_dir) if entry.is_file()),
+                             key=lambda entry: entry.stat().st_mtime)
+            self.size = sum(entry.stat().st_size for entry in entries)
+            # Drop least recently used files down to EVICT_TARGET of the budget so every request does not evict
+            for entry in entries:
+                if self.size <= self.max_bytes * EVICT_TARGET:
+                    break
+                try:
+                    entry_size = entry.stat().st_size
+                    os.remove(entry.path)
+                    self.size -= entry_size
+                except OSError:
+                    pass
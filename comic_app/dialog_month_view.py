@@ -0,0 +1,129 @@
+import queue
+import threading
+import tkinter as tk
+from datetime import date
+from PIL import Image, ImageTk
+
+from comic_app.thumbnails import month_range
+
+POLL_MS = 50
+# Thumbnails are cached wider than a grid cell, they are scaled down again for display
+CELL_SIZE = 120
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+class MonthViewDialog:
+    def __init__(self, parent, thumbnailer, comic_index, short_code, comic_date):
+        top = self.top = tk.Toplevel(parent)
+        self.top.transient(parent)
+        self.top.grab_set()
+        self.top.title("Month View")
+        self.result = None
+
+        self.thumbnailer = thumbnailer
+        self.comic_index = comic_index
+        self.short_code = short_code
+        self.year = comic_date.year
+        self.month = comic_date.month
+        # Tk drops images that are not referenced from Python
+        self.photos = []
+        self.results = queue.Queue()
+        self.generation = 0
+        self.closed = False
+
+        top.bind("<Escape>", self.on_cancel)
+        top.protocol("WM_DELETE_WINDOW", self.on_cancel)
+        top.focus_set()
+
+        header = tk.Frame(top)
+        header.pack(pady=5)
+        tk.Button(header, text="<", command=lambda: self.shift_month(-1)).pack(side=tk.LEFT)
+        self.title_label = tk.Label(header, width=20)
+        self.title_label.pack(side=tk.LEFT)
+        tk.Button(header, text=">", command=lambda: self.shift_month(1)).pack(side=tk.LEFT)
+
+        self.grid_frame = tk.Frame(top)
+        self.grid_frame.pack(padx=5, pady=5)
+
+        self.load_month()
+        self.top.after(POLL_MS, self.poll)
+
+    def shift_month(self, amount):
+        self.year, month_index = divmod(self.year * 12 + self.month - 1 + amount, 12)
+        self.month = month_index + 1
+        self.load_month()
+
+    def load_month(self):
+        # Thumbnails are generated off the Tk thread, the grid fills in once they are ready
+        self.generation += 1
+        generation, year, month = self.generation, self.year, self.month
+        self.title_label.config(text=date(year, month, 1).strftime("%B %Y"))
+        self.clear_grid()
+        tk.Label(self.grid_frame, text="Loading...").grid(row=0, column=0, columnspan=7)
+
+        def run():
+            try:
+                strips = self.thumbnailer.month(self.comic_index, self.short_code, year, month)
+            except Exception as e:
+                print(f"Error loading month view: {e}")
+                strips = []
+            self.results.put((generation, year, month, strips))
+        threading.Thread(target=run, daemon=True).start()
+
+    def poll(self):
+        if self.closed:
+            return
+        try:
+            while True:
+                generation, year, month, strips = self.results.get_nowait()
+                # Results for a month the user already left are dropped
+                if generation == self.generation:
+                    self.show_month(year, month, strips)
+        except queue.Empty:
+            pass
+        self.top.after(POLL_MS, self.poll)
+
+    def clear_grid(self):
+        for child in self.grid_frame.winfo_children():
+            child.destroy()
+        self.photos = []
+
+    def show_month(self, year, month, strips):
+        self.clear_grid()
+        for column, weekday in enumerate(WEEKDAYS):
+            tk.Label(self.grid_frame, text=weekday).grid(row=0, column=column)
+
+        strips_by_date = {comic_date: thumbnail_path for comic_date, _, thumbnail_path in strips}
+        first, last = month_range(year, month)
+        for day in range(1, last.day + 1):
+            comic_date = date(year, month, day)
+            position = first.weekday() + day - 1
+            cell = tk.Frame(self.grid_frame, width=CELL_SIZE, height=CELL_SIZE, bd=1, relief=tk.SOLID)
+            cell.grid(row=position // 7 + 1, column=position % 7, padx=1, pady=1)
+            cell.pack_propagate(False)
+            tk.Label(cell, text=str(day)).pack()
+
+            if comic_date not in strips_by_date:
+                continue
+            thumbnail_path = strips_by_date[comic_date]
+            if thumbnail_path:
+                with Image.open(thumbnail_path) as image:
+                    image.thumbnail((CELL_SIZE - 4, CELL_SIZE - 24))
+                    photo = ImageTk.PhotoImage(image)
+                self.photos.append(photo)
+                label = tk.Label(cell, image=photo, cursor="hand2")
+            else:
+                label = tk.Label(cell, text="Available", cursor="hand2")
+            label.pack()
+            for widget in (cell, label):
+                widget.bind("<Button-1>", lambda event, comic_date=comic_date: self.on_select(comic_date))
+
+    def on_select(self, comic_date):
+        self.result = comic_date
+        self.close()
+
+    def on_cancel(self, event=None):
+        self.close()
+
+    def close(self):
+        self.closed = True
+        self.top.destroy()
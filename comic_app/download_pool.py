@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+class DownloadPool:
+    def __init__(self, max_workers=4, host_limits=None, default_host_limit=2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="comic-download")
+        self.host_limits = host_limits or {}
+        self.default_host_limit = default_host_limit
+        self.host_semaphores = {}
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def submit(self, key, fn, *args, listener=None):
+        # Requests for a key that is already in flight attach to the existing future
+        with self.lock:
+            entry = self.in_flight.get(key)
+            if entry is None:
+                entry = {"future": None, "listeners": [], "last_update": None}
+                self.in_flight[key] = entry
+                entry["future"] = self.executor.submit(self._run, key, entry, fn, *args)
+                entry["future"].add_done_callback(lambda future: self._finish(key, entry))
+            if listener:
+                entry["listeners"].append(listener)
+                last_update = entry["last_update"]
+            else:
+                last_update = None
+
+        if listener and last_update:
+            listener(**last_update)
+        return entry["future"]
+
+    def host_slot(self, url):
+        host = urlparse(url).hostname or ""
+        with self.lock:
+            semaphore = self.host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.host_limits.get(host, self.default_host_limit))
+                self.host_semaphores[host] = semaphore
+        return semaphore
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, key, entry, fn, *args):
+        def notify(**fields):
+            with self.lock:
+                entry["last_update"] = fields
+                listeners = list(entry["listeners"])
+            for listener in listeners:
+                listener(**fields)
+        return fn(notify, *args)
+
+    def _finish(self, key, entry):
+        with self.lock:
+            if self.in_flight.get(key) is entry:
+                del self.in_flight[key]
@@ -0,0 +1,72 @@
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (5, 30)
+MAX_VALIDATORS = 4096
+
+class HttpClient:
+    def __init__(self, timeout=DEFAULT_TIMEOUT, pool_connections=10, pool_maxsize=4, session=None):
+        self.timeout = tuple(timeout)
+        self.session = session or requests.Session()
+        # One keep-alive pool per host, pool_block caps concurrent connections to a host at pool_maxsize
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # requests already advertises gzip/deflate and decodes bodies transparently in iter_content
+        self.session.headers.setdefault('Accept-Encoding', 'gzip, deflate')
+        self.validators = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, url, stream=False, headers=None):
+        return self.session.get(url, stream=stream, headers=headers, timeout=self.timeout)
+
+    def conditional_get(self, url, file_path, stream=True):
+        # Revalidate a local copy with If-None-Match / If-Modified-Since, a 304 means the copy is current
+        headers = {}
+        if os.path.exists(file_path):
+            with self.lock:
+                etag = self.validators.get(url)
+            if etag:
+                headers['If-None-Match'] = etag
+            headers['If-Modified-Since'] = formatdate(os.path.getmtime(file_path), usegmt=True)
+        response = self.get(url, stream=stream, headers=headers)
+        if response.status_code != 304:
+            self.remember(url, response)
+        return response
+
+    def remember(self, url, response):
+        etag = response.headers.get('ETag')
+        if not etag:
+            return
+        with self.lock:
+            self.validators[url] = etag
+            self.validators.move_to_end(url)
+            while len(self.validators) > MAX_VALIDATORS:
+                self.validators.popitem(last=False)
+
+    def close(self):
+        self.session.close()
+
+_client = None
+_client_lock = threading.Lock()
+
+def configure_client(settings):
+    global _client
+    with _client_lock:
+        if _client:
+            _client.close()
+        _client = HttpClient(timeout=settings.get("http_timeout", DEFAULT_TIMEOUT),
+                             pool_maxsize=settings.get("http_pool_maxsize", 4))
+    return _client
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -1,62 +1,163 @@
-import os
 import tkinter as tk
 from PIL import Image, ImageTk
 import io
 import platform
 import subprocess
+from collections import namedtuple
+
+from comic_app.render_cache import RenderCache
+from comic_app.strip_packs import strip_source, strip_stat
 
 if platform.system() == "Windows":
     import win32clipboard
     from win32clipboard import CF_DIB
 
+DecodedImage = namedtuple('DecodedImage', ['image', 'full_size'])
+
+# Resize events closer together than this are treated as one continuous drag
+RESIZE_DEBOUNCE_MS = 150
+
+def fit_size(window_width, window_height, image_size):
+    if window_width <= 1 or window_height <= 1:
+        return None
+
+    image_width, image_height = image_size
+
+    aspect_ratio = image_width / image_height
+    new_width = min(window_width, int(window_height * aspect_ratio))
+    new_height = min(window_height, int(window_width / aspect_ratio))
+
+    if new_width <= 0 or new_height <= 0:
+        return None
+    return new_width, new_height
+
+def decode_image(file_path, window_size=None):
+    # Decode at the smallest scale that still covers the window
+    image = Image.open(strip_source(file_path))
+    full_size = image.size
+    target_size = fit_size(*window_size, full_size) if window_size else None
+    if target_size:
+        # JPEG decodes straight to 1/2, 1/4 or 1/8 scale in the DCT domain, other formats ignore this
+        image.draft(image.mode, target_size)
+    # load() also closes the file so the strip can be deleted or replaced while displayed
+    image.load()
+
+    if target_size:
+        factor = min(image.width // target_size[0], image.height // target_size[1])
+        if factor > 1:
+            image = image.reduce(factor)
+    return DecodedImage(image, full_size)
+
 class ImageHandler:
-    def __init__(self, image_label, status_bar):
+    def __init__(self, image_label, status_bar, cache_mb=64):
         self.image_label = image_label
         self.status_bar = status_bar
         self.image = None
         self.current_file_path = None
+        self.current_mtime = None
+        self.full_size = None
+        self.render_cache = RenderCache(cache_mb * 1024 * 1024)
+        self.pending_render = None
+        self.shown_key = None
 
     def load_image(self, file_path):
         self.current_file_path = file_path
         try:
-            self.image = Image.open(file_path)
-            self.update_image(self.image_label.winfo_width(), self.image_label.winfo_height(), self.status_bar.winfo_height())
+            self.current_mtime = strip_stat(file_path).st_mtime
+            decoded = self.render_cache.get((file_path, self.current_mtime))
+            if decoded is None:
+                decoded = decode_image(file_path, self.current_window_size())
+                self.render_cache.put((file_path, self.current_mtime), decoded)
+            self.image, self.full_size = decoded
+            self.update_image(self.image_label.winfo_width(), self.image_label.winfo_height(), self.status_bar.winfo_height(), final=True)
         except Exception as e:
             print(f"Error loading image: {e}")
             self.clear_image()
 
     def clear_image(self):
+        self.cancel_pending_render()
+        self.shown_key = None
+        self.current_file_path = None
         self.image_label.config(image='')
         self.image_label.image = None
         self.image = None
-
-    def update_image(self, frame_width, frame_height, status_height):
+        self.full_size = None
+
+    def full_image(self):
+        # The displayed image is decoded at screen resolution, Save As and Copy want the original
+        if not self.image:
+            return None
+        if self.image.size == self.full_size:
+            return self.image
+        image, _ = decode_image(self.current_file_path)
+        return image
+
+    def current_window_size(self):
+        return self.window_size(self.image_label.winfo_width(), self.image_label.winfo_height(), self.status_bar.winfo_height())
+
+    def window_size(self, frame_width, frame_height, status_height):
+        if frame_width <= 1 or frame_height - status_height <= 1:
+            return None
+        return frame_width, frame_height - status_height
+
+    def update_image(self, frame_width, frame_height, status_height, final=False):
         if self.image:
-            window_width = frame_width
-            window_height = frame_height - status_height
-
-            if window_width <= 1 or window_height <= 1:
+            target_size = fit_size(frame_width, frame_height - status_height, self.full_size)
+            if target_size is None:
                 return
 
-            image_width, image_height = self.image.size
-
-            aspect_ratio = image_width / image_height
-            new_width = min(window_width, int(window_height * aspect_ratio))
-            new_height = min(window_height, int(window_width / aspect_ratio))
-
-            if new_width <= 0 or new_height <= 0:
+            cache_key = (self.current_file_path, self.current_mtime) + target_size
+            if cache_key == self.shown_key:
+                self.cancel_pending_render()
                 return
 
-            resized_image = self.image.resize((new_width, new_height), Image.LANCZOS)
-            photo = ImageTk.PhotoImage(resized_image)
-
-            self.image_label.config(image=photo)
-            self.image_label.image = photo
+            resized_image = self.render_cache.get(cache_key)
+            if resized_image is not None:
+                self.cancel_pending_render()
+                self.show(resized_image, cache_key)
+            elif final:
+                self.cancel_pending_render()
+                self.render_final(target_size)
+            else:
+                # Cheap preview while the window is still being dragged, full quality once it settles
+                self.show(self.image.resize(target_size, Image.NEAREST), None)
+                self.cancel_pending_render()
+                self.pending_render = self.image_label.after(RESIZE_DEBOUNCE_MS, self.render_final, target_size)
+
+    def render_final(self, target_size):
+        self.pending_render = None
+        if not self.image:
+            return
+        if (target_size[0] > self.image.width or target_size[1] > self.image.height) and self.image.size != self.full_size:
+            # The window grew past the reduced decode, decode again at the new size
+            try:
+                decoded = decode_image(self.current_file_path, target_size)
+                self.render_cache.put((self.current_file_path, self.current_mtime), decoded)
+                self.image, self.full_size = decoded
+            except Exception as e:
+                print(f"Error loading image: {e}")
+                self.clear_image()
+                return
+        cache_key = (self.current_file_path, self.current_mtime) + target_size
+        resized_image = self.image.resize(target_size, Image.LANCZOS)
+        self.render_cache.put(cache_key, resized_image)
+        self.show(resized_image, cache_key)
+
+    def cancel_pending_render(self):
+        if self.pending_render:
+            self.image_label.after_cancel(self.pending_render)
+            self.pending_render = None
+
+    def show(self, resized_image, cache_key):
+        photo = ImageTk.PhotoImage(resized_image)
+        self.image_label.config(image=photo)
+        self.image_label.image = photo
+        self.shown_key = cache_key
 
     def copy_to_clipboard(self):
         if self.image:
             output = io.BytesIO()
-            self.image.convert("RGB").save(output, format="BMP")
+            self.full_image().convert("RGB").save(output, format="BMP")
             data = output.getvalue()[14:]  # BMP header is 14 bytes long
             output.close()
 
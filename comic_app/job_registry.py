@@ -0,0 +1,72 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+FINISHED_STATES = ("success", "failure")
+
+class JobRegistry:
+    def __init__(self, max_jobs=256, ttl=300):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        # Notified on every job update so waiters (long-poll and event streams) wake up
+        self.changed = threading.Condition(self.lock)
+
+    def create(self, owner=None, **fields):
+        job_id = uuid.uuid4().hex
+        job = {"status": "waiting", "file_path": "", "owner": owner, "finished_at": None, "version": 0}
+        job.update(fields)
+        with self.lock:
+            self.expire_jobs()
+            self.jobs[job_id] = job
+        return job_id
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return False
+            job.update(fields)
+            job["version"] += 1
+            if job["status"] in FINISHED_STATES and job["finished_at"] is None:
+                job["finished_at"] = time.monotonic()
+            self.changed.notify_all()
+            return True
+
+    def get(self, job_id, owner=None):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or (owner is not None and job["owner"] != owner):
+                return None
+            return dict(job)
+
+    def wait(self, job_id, version, timeout, owner=None):
+        # Block until the job moves past `version` or finishes, returns the job or None once it is gone
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while True:
+                job = self.jobs.get(job_id)
+                if job is None or (owner is not None and job["owner"] != owner):
+                    return None
+                remaining = deadline - time.monotonic()
+                if job["version"] != version or job["finished_at"] is not None or remaining <= 0:
+                    return dict(job)
+                self.changed.wait(remaining)
+
+    def expire_jobs(self):
+        # Caller must hold self.lock
+        now = time.monotonic()
+        for job_id in [job_id for job_id, job in self.jobs.items()
+                       if job["finished_at"] is not None and now - job["finished_at"] > self.ttl]:
+            del self.jobs[job_id]
+
+        # Still over budget: drop the oldest finished jobs first, then the oldest jobs overall
+        if len(self.jobs) >= self.max_jobs:
+            for job_id in [job_id for job_id, job in self.jobs.items() if job["finished_at"] is not None]:
+                if len(self.jobs) < self.max_jobs:
+                    break
+                del self.jobs[job_id]
+        while len(self.jobs) >= self.max_jobs:
+            self.jobs.popitem(last=False)
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+class SlidingWindowLimiter:
+    # At most max_attempts failed attempts per key within the last window_seconds
+    def __init__(self, max_attempts=5, window_seconds=300, max_keys=10000):
+        self.max_attempts = max_attempts
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self.attempts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def retry_after(self, key):
+        # Seconds until key may try again, 0 when it is not throttled
+        with self.lock:
+            attempts = self._trim(key)
+            if attempts is None or len(attempts) < self.max_attempts:
+                return 0
+            return max(0, attempts[0] + self.window_seconds - time.monotonic())
+
+    def record(self, key):
+        with self.lock:
+            attempts = self._trim(key)
+            if attempts is None:
+                attempts = self.attempts[key] = deque(maxlen=self.max_attempts)
+            attempts.append(time.monotonic())
+            self.attempts.move_to_end(key)
+            # Bound memory under a spray of distinct keys, the least recently seen keys go first
+            while len(self.attempts) > self.max_keys:
+                self.attempts.popitem(last=False)
+
+    def reset(self, key):
+        with self.lock:
+            self.attempts.pop(key, None)
+
+    def _trim(self, key):
+        # Caller must hold self.lock
+        attempts = self.attempts.get(key)
+        if attempts is None:
+            return None
+        cutoff = time.monotonic() - self.window_seconds
+        while attempts and attempts[0] <= cutoff:
+            attempts.popleft()
+        if not attempts:
+            del self.attempts[key]
+            return None
+        return attempts
+
+class PasswordChecker:
+    # Runs bcrypt on a few dedicated threads so a burst of logins cannot take every request thread
+    def __init__(self, bcrypt, max_workers=2, max_pending=16, timeout=10):
+        self.bcrypt = bcrypt
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password")
+        self.slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def check(self, password_hash, password):
+        # Returns None when the queue is full or the check timed out, the caller should answer "try again later"
+        return self._run(self.bcrypt.check_password_hash, password_hash, password)
+
+    def generate(self, password):
+        return self._run(self.bcrypt.generate_password_hash, password)
+
+    def _run(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            return None
+        future = self.executor.submit(fn, *args)
+        # The slot stays taken until bcrypt finishes, even when the request stops waiting for it
+        future.add_done_callback(lambda future: self.slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            return None
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,101 @@
+import argparse
+import os
+import zipfile
+from datetime import date
+
+from comic_app.cli import add_settings_argument, find_comic, load_settings, open_comic_index, rebuild_index_cache
+from comic_app.comic_index import parse_file_name
+from comic_app.strip_fetcher import atomic_write
+from comic_app.strip_packs import PACK_PATTERN, discard_pack, pack_name
+
+def pack_folder(folder_path, short_code=None, year=None, progress=None):
+    # Move flat <short_code><yymmdd> files into one <short_code><yyyy>.cbz per comic and year
+    groups = {}
+    with os.scandir(folder_path) as folder:
+        for entry in folder:
+            parsed = parse_file_name(entry.name)
+            if not parsed or not entry.is_file():
+                continue
+            strip_year = date.fromordinal(parsed[1]).year
+            if (short_code is None or parsed[0] == short_code) and (year is None or strip_year == year):
+                groups.setdefault((parsed[0], strip_year), []).append((entry.path, entry.name))
+
+    counts = {"packs": 0, "files": 0, "bytes": 0}
+    for (group_short_code, group_year), files in sorted(groups.items()):
+        counts["bytes"] += sum(os.path.getsize(file_path) for file_path, _ in files)
+        write_pack(os.path.join(folder_path, pack_name(group_short_code, group_year)), files)
+        for file_path, _ in files:
+            os.remove(file_path)
+        counts["packs"] += 1
+        counts["files"] += len(files)
+        if progress:
+            progress(counts)
+    return counts
+
+def write_pack(pack_path, files):
+    # Strips are compressed images already, members are stored so readers can slice them straight from the mapped pack
+    names = {name for _, name in files}
+    with atomic_write(pack_path, before_replace=lambda temp_path: discard_pack(pack_path)) as temp_file:
+        with zipfile.ZipFile(temp_file, 'w', zipfile.ZIP_STORED) as archive:
+            if os.path.exists(pack_path):
+                # Repacking a year keeps what is already packed, flat files replace members of the same name
+                with zipfile.ZipFile(pack_path) as existing:
+                    for info in existing.infolist():
+                        if info.filename not in names:
+                            archive.writestr(info, existing.read(info))
+            for file_path, name in sorted(files, key=lambda file: file[1]):
+                archive.write(file_path, name)
+
+def unpack_folder(folder_path, short_code=None, year=None, progress=None):
+    # Extract packs back into flat files, a flat file already on disk is kept over the packed copy
+    counts = {"packs": 0, "files": 0, "bytes": 0}
+    with os.scandir(folder_path) as folder:
+        packs = [entry.path for entry in folder if entry.is_file() and PACK_PATTERN.match(entry.name)]
+
+    for pack_path in sorted(packs):
+        match = PACK_PATTERN.match(os.path.basename(pack_path))
+        if (short_code is not None and match.group("short_code") != short_code) or (year is not None and int(match.group("year")) != year):
+            continue
+        discard_pack(pack_path)
+        with zipfile.ZipFile(pack_path) as archive:
+            for info in archive.infolist():
+                # Only plain strip names, never paths, so a crafted pack cannot write outside the folder
+                name = os.path.basename(info.filename)
+                file_path = os.path.join(folder_path, name)
+                if not parse_file_name(name) or os.path.exists(file_path):
+                    continue
+                with atomic_write(file_path) as temp_file:
+                    temp_file.write(archive.read(info))
+                counts["files"] += 1
+                counts["bytes"] += info.file_size
+        os.remove(pack_path)
+        counts["packs"] += 1
+        if progress:
+            progress(counts)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Bundle the comics folder into per-comic, per-year CBZ packs, or extract them again.")
+    parser.add_argument("command", choices=("pack", "unpack"))
+    parser.add_argument("--comic", help="Only this comic, by name as shown in the viewer")
+    parser.add_argument("--year", type=int, help="Only this year")
+    add_settings_argument(parser)
+    args = parser.parse_args()
+
+    settings, settings_dir = load_settings(args)
+    short_code = find_comic(parser, settings, args.comic)["short_code"] if args.comic else None
+    folder_path = settings["folder_path"]
+
+    def progress(counts):
+        print(f"\r{counts['packs']} packs, {counts['files']} files", end="", flush=True)
+
+    if args.command == "pack":
+        counts = pack_folder(folder_path, short_code, args.year, progress)
+    else:
+        counts = unpack_folder(folder_path, short_code, args.year, progress)
+    print(f"\n{args.command.capitalize()}ed {counts['files']} files ({counts['bytes'] // 1024} KB) in {counts['packs']} packs")
+
+    rebuild_index_cache(open_comic_index(settings, settings_dir))
+
+if __name__ == "__main__":
+    main()
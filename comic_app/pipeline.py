@@ -0,0 +1,248 @@
+import argparse
+import os
+import sqlite3
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+from PIL import Image
+
+from comic_app.cli import add_settings_argument, find_comic, load_settings, open_comic_index
+from comic_app.derivatives import DerivativeCache, EVICT_TARGET, FORMATS, WIDTH_BUCKETS, negotiate_format, save_derivative, supported_formats
+from comic_app.strip_packs import strip_source, strip_stat
+from comic_app.thumbnails import THUMBNAIL_CACHE_DIR, THUMBNAIL_FORMAT, THUMBNAIL_WIDTH
+
+HASH_DB_FILE = 'hashes.db'
+
+# Web variant made when the WebUI has not asked for any yet, what current browsers negotiate for a laptop-sized window
+DEFAULT_VARIANT_WIDTH = 1200
+BROWSER_ACCEPT = "image/avif,image/webp,*/*"
+
+# A (width, format) pair needs this share of the cached variants to count as one the WebUI uses
+MIN_VARIANT_SHARE = 0.1
+
+# dHash compares neighbouring pixels of a 9x8 greyscale copy, one bit per pair
+HASH_SIZE = 8
+
+def difference_hash(image):
+    # 64 bit perceptual hash as 16 hex digits, near-identical strips (rescans, recompressions) differ in few bits
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(HASH_SIZE):
+        for column in range(HASH_SIZE):
+            offset = row * (HASH_SIZE + 1) + column
+            value = value << 1 | (pixels[offset] > pixels[offset + 1])
+    return f"{value:0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+def process_strip(source_path, targets, want_hash):
+    # Runs in a worker process: decodes the strip once, writes every (file path, width, format name) target.
+    # Returns (sizes of the written files, dHash or None).
+    with Image.open(strip_source(source_path)) as image:
+        image.load()
+        sizes = [save_derivative(image, file_path, width, format_name) for file_path, width, format_name in targets]
+        return sizes, difference_hash(image) if want_hash else None
+
+def requested_variants(derivative_cache):
+    # The (width, format name) pairs the WebUI has asked for, read back from the <stem>.<width>.<mtime>.<ext> cache names
+    formats = {extension: name for name, (_, _, extension, _) in FORMATS.items()}
+    seen = Counter()
+    for entry in os.scandir(derivative_cache.cache_dir):
+        parts = entry.name.split(".")
+        if len(parts) == 4 and parts[1].isdigit() and parts[3] in formats:
+            seen[(int(parts[1]), formats[parts[3]])] += 1
+    total = sum(seen.values())
+    return [variant for variant, count in seen.most_common() if count >= total * MIN_VARIANT_SHARE]
+
+class HashStore:
+    def __init__(self, db_path=HASH_DB_FILE):
+        self.lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS strip_hash ("
+                " file_path TEXT PRIMARY KEY,"
+                " mtime_ns INTEGER NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " dhash TEXT NOT NULL)"
+            )
+
+    def get(self, file_path, stat):
+        # The stored hash, or None when the strip changed since it was computed
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT dhash FROM strip_hash WHERE file_path = ? AND mtime_ns = ? AND size = ?",
+                (file_path, stat.st_mtime_ns, stat.st_size)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, file_path, stat, dhash):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO strip_hash (file_path, mtime_ns, size, dhash) VALUES (?, ?, ?, ?)",
+                (file_path, stat.st_mtime_ns, stat.st_size, dhash)
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+class Pipeline:
+    # Fills the thumbnail and web variant caches and the hash store for the whole archive ahead of time
+    def __init__(self, comic_index, thumbnail_cache, derivative_cache, hash_store, variants, max_workers=None):
+        self.comic_index = comic_index
+        self.hash_store = hash_store
+        self.max_workers = max_workers or os.cpu_count() or 2
+        # (cache, width, format name) for every file a strip should have
+        self.outputs = [(thumbnail_cache, THUMBNAIL_WIDTH, THUMBNAIL_FORMAT)]
+        self.outputs += [(derivative_cache, width, format_name) for width, format_name in variants]
+        self.counts = {"total": 0, "skipped": 0, "processed": 0, "failed": 0, "files": 0, "bytes": 0, "over_budget": 0}
+        # Per cache: files queued but not written yet, and (bytes, files) written by this run
+        self.in_flight = Counter()
+        self.written = {cache: (0, 0) for cache, _, _ in self.outputs}
+
+    def pending(self, short_codes=None):
+        # (source path, stat, [(cache, file path, width, format name)], want hash) for every strip with anything out of date,
+        # newest first so a cache that fills up holds the strips most likely to be viewed
+        strips = []
+        for short_code in short_codes or self.comic_index.short_codes():
+            strips.extend(self.comic_index.dates_between(short_code, date.min, date.max))
+        strips.sort(key=lambda strip: strip[0], reverse=True)
+
+        jobs = []
+        for _, source_path in strips:
+            try:
+                stat = strip_stat(source_path)
+                targets = [(cache, cache.path_for(source_path, width, format_name), width, format_name)
+                           for cache, width, format_name in self.outputs]
+            except OSError as e:
+                print(f"Skipping {source_path}: {e}")
+                continue
+            # Cache entries are named after the strip's mtime, an existing file is up to date
+            targets = [target for target in targets if not os.path.exists(target[1])]
+            want_hash = self.hash_store.get(source_path, stat) is None
+            if targets or want_hash:
+                jobs.append((source_path, stat, targets, want_hash))
+            else:
+                self.counts["skipped"] += 1
+        return jobs
+
+    def run(self, short_codes=None, progress=None):
+        jobs = self.pending(short_codes)
+        self.counts["total"] = len(jobs) + self.counts["skipped"]
+        if not jobs:
+            return self.counts
+
+        # Decoding and encoding are CPU bound, so the work is spread over processes rather than threads.
+        # Only a few strips per worker are queued at a time, so a cache filling up stops new work for it promptly.
+        jobs = iter(jobs)
+        running = {}
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                while len(running) < self.max_workers * 2:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    job = self.within_budget(job)
+                    if job is None:
+                        continue
+                    source_path, _, targets, want_hash = job
+                    work = [(file_path, width, format_name) for _, file_path, width, format_name in targets]
+                    running[executor.submit(process_strip, source_path, work, want_hash)] = job
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.finish(future, running.pop(future))
+                if progress:
+                    progress(self.counts)
+        return self.counts
+
+    def within_budget(self, job):
+        # Only fill the room a cache has left, never evict what is already cached to make space for bulk output
+        source_path, stat, targets, want_hash = job
+        kept = []
+        for target in targets:
+            if self.has_room(target[0]):
+                self.in_flight[target[0]] += 1
+                kept.append(target)
+        self.counts["over_budget"] += len(targets) - len(kept)
+        if not kept and not want_hash:
+            self.counts["skipped"] += 1
+            return None
+        return source_path, stat, kept, want_hash
+
+    def has_room(self, cache):
+        # Stop below the level evict() trims to, going past it would push out derivatives that are in use.
+        # Queued files count at the average size of those written so far.
+        written_bytes, written_files = self.written[cache]
+        queued = self.in_flight[cache] * written_bytes / written_files if written_files else 0
+        with cache.lock:
+            return cache.size + queued < cache.max_bytes * EVICT_TARGET
+
+    def finish(self, future, job):
+        source_path, stat, targets, want_hash = job
+        for cache, _, _, _ in targets:
+            self.in_flight[cache] -= 1
+        try:
+            sizes, dhash = future.result()
+        except Exception as e:
+            print(f"Error processing {source_path}: {e}")
+            self.counts["failed"] += 1
+            return
+        for (cache, _, _, _), size in zip(targets, sizes):
+            with cache.lock:
+                cache.size += size
+            written_bytes, written_files = self.written[cache]
+            self.written[cache] = (written_bytes + size, written_files + 1)
+            cache.evict()
+        if dhash:
+            self.hash_store.put(source_path, stat, dhash)
+        self.counts["processed"] += 1
+        self.counts["files"] += len(sizes)
+        self.counts["bytes"] += sum(sizes)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate thumbnails, web variants and perceptual hashes for the comics folder.")
+    parser.add_argument("--comic", help="Only this comic, by name as shown in the viewer")
+    parser.add_argument("--widths", type=int, nargs="+", choices=WIDTH_BUCKETS, help="Web variant widths (default: those the WebUI has requested)")
+    parser.add_argument("--formats", nargs="+", choices=supported_formats(), help="Web variant formats (default: those the WebUI has requested)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes")
+    add_settings_argument(parser)
+    args = parser.parse_args()
+
+    settings, settings_dir = load_settings(args)
+    short_codes = [find_comic(parser, settings, args.comic)["short_code"]] if args.comic else None
+
+    # Same locations as the WebUI, so it serves what was generated here
+    comic_index = open_comic_index(settings, settings_dir)
+    thumbnail_cache = DerivativeCache(settings.get("thumbnail_cache_dir", os.path.join(settings_dir, THUMBNAIL_CACHE_DIR)),
+                                      settings.get("thumbnail_cache_mb", 64) * 1024 * 1024)
+    derivative_cache = DerivativeCache(settings.get("derivative_cache_dir", os.path.join(settings_dir, "derivatives")),
+                                       settings.get("derivative_cache_mb", 512) * 1024 * 1024)
+    hash_store = HashStore(os.path.join(settings_dir, HASH_DB_FILE))
+    default_format = negotiate_format(BROWSER_ACCEPT)
+    if args.widths or args.formats:
+        variants = [(width, format_name) for width in args.widths or [DEFAULT_VARIANT_WIDTH] for format_name in args.formats or [default_format]]
+    else:
+        variants = requested_variants(derivative_cache) or [(DEFAULT_VARIANT_WIDTH, default_format)]
+    print("Web variants: " + ", ".join(f"{width} {format_name}" for width, format_name in variants))
+    pipeline = Pipeline(comic_index, thumbnail_cache, derivative_cache, hash_store, variants, args.workers)
+
+    def progress(counts):
+        finished = counts["processed"] + counts["failed"]
+        print(f"\r{finished}/{counts['total'] - counts['skipped']} strips, {counts['files']} files", end="", flush=True)
+
+    counts = pipeline.run(short_codes, progress)
+    hash_store.close()
+    print(f"\nProcessed {counts['processed']} of {counts['total']} strips ({counts['skipped']} skipped, {counts['failed']} failed), "
+          f"wrote {counts['files']} files ({counts['bytes'] // 1024} KB)")
+    if counts["over_budget"]:
+        print(f"{counts['over_budget']} files were not made because a cache is full, "
+              f"raise thumbnail_cache_mb or derivative_cache_mb to keep more")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+from PIL import Image
+
+from comic_app.image_handler import decode_image, fit_size
+from comic_app.strip_packs import strip_stat
+
+# Steps the navigation buttons and arrow keys can take from the current date
+PREFETCH_STEPS = [timedelta(days=1), timedelta(weeks=1), relativedelta(months=1)]
+
+class Prefetcher:
+    def __init__(self, render_cache, max_workers=2):
+        self.render_cache = render_cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="comic-prefetch")
+        self.generation = 0
+        self.futures = []
+        self.lock = threading.Lock()
+
+    def prefetch(self, comic_index, short_code, comic_date, direction, window_size):
+        # Warm the dates the next key press is likely to land on, ahead of the user's direction of travel
+        self.cancel()
+        if window_size is None:
+            return
+        directions = [direction] if direction else [1, -1]
+        file_paths = []
+        for step in PREFETCH_STEPS:
+            for sign in directions:
+                file_path = comic_index.lookup(short_code, comic_date + step if sign > 0 else comic_date - step)
+                if file_path:
+                    file_paths.append(file_path)
+
+        with self.lock:
+            generation = self.generation
+            self.futures = [self.executor.submit(self.warm, generation, file_path, window_size) for file_path in file_paths]
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+            for future in self.futures:
+                future.cancel()
+            self.futures = []
+
+    def is_stale(self, generation):
+        with self.lock:
+            return generation != self.generation
+
+    def warm(self, generation, file_path, window_size):
+        try:
+            mtime = strip_stat(file_path).st_mtime
+            decoded = self.render_cache.get((file_path, mtime))
+            if decoded is None:
+                if self.is_stale(generation):
+                    return
+                decoded = decode_image(file_path, window_size)
+                self.render_cache.put((file_path, mtime), decoded)
+
+            target_size = fit_size(*window_size, decoded.full_size)
+            if target_size is None or self.is_stale(generation):
+                return
+            cache_key = (file_path, mtime) + target_size
+            if self.render_cache.get(cache_key) is None:
+                self.render_cache.put(cache_key, decoded.image.resize(target_size, Image.LANCZOS))
+        except Exception as e:
+            print(f"Error prefetching {file_path}: {e}")
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
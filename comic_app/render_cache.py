@@ -0,0 +1,41 @@
+import threading
+from collections import OrderedDict
+
+class RenderCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            image = self.entries.get(key)
+            if image is not None:
+                self.entries.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        image_size = self.image_size(image)
+        if image_size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.image_size(self.entries.pop(key))
+            self.entries[key] = image
+            self.size += image_size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= self.image_size(evicted)
+
+    def discard(self, file_path):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == file_path]:
+                self.size -= self.image_size(self.entries.pop(key))
+
+    def image_size(self, image):
+        # Entries are either resized frames or (image, full_size) decode results
+        if isinstance(image, tuple):
+            image = image[0]
+        width, height = image.size
+        return width * height * len(image.getbands())
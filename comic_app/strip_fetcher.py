@@ -0,0 +1,140 @@
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+import requests
+
+from comic_app.http_client import get_client
+from comic_app.url_cache import UrlCache, DEFAULT_NEGATIVE_TTL
+
+try:
+    from comic_app.image_url_parser import Image_URL_Parser
+    parser_available = True
+except ImportError:
+    parser_available = False
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+CHUNK_SIZE = 8192
+MIN_IMAGE_BYTES = 64
+
+# Types that are certainly not a strip (error pages, API responses). Anything else, including
+# application/octet-stream or no type at all, is left to Pillow to judge.
+NON_IMAGE_TYPES = ("text/", "application/json", "application/xml", "application/xhtml+xml", "application/javascript")
+
+# Strips are sometimes published late, a date this close to today without one may still get it
+RECENT_DAYS = 7
+
+# One parser per comic URL snippet, shared by every download. The parser keeps per-request state, so each comes
+# with a lock and lookups for the same comic take turns while other comics resolve in parallel.
+_parsers = {}
+_parsers_lock = threading.Lock()
+_url_cache = None
+
+class FetchCancelled(Exception):
+    pass
+
+class InvalidImage(Exception):
+    pass
+
+def configure_url_cache(cache_path, negative_ttl=DEFAULT_NEGATIVE_TTL):
+    global _url_cache
+    _url_cache = UrlCache(cache_path, negative_ttl)
+    return _url_cache
+
+def is_recent(comic_date):
+    return comic_date > date.today() - timedelta(days=RECENT_DAYS)
+
+def get_parser(comic_url):
+    # Returns (parser, lock), the lock must be held while the parser is used
+    with _parsers_lock:
+        entry = _parsers.get(comic_url)
+        if entry is None:
+            entry = _parsers[comic_url] = (Image_URL_Parser(comic_url), threading.Lock())
+        return entry
+
+def resolve_image_url(comic_url, comic_date):
+    if _url_cache:
+        hit, image_url = _url_cache.get(comic_url, comic_date)
+        if hit:
+            return image_url
+
+    parser, parser_lock = get_parser(comic_url)
+    with parser_lock:
+        image_url = parser.get_comic_image_url(
+            comic_date.year,
+            f"{comic_date.month:02d}",
+            f"{comic_date.day:02d}"
+        )
+    # A miss for a recent date is likely a strip that is not up yet, or a parser that failed quietly, ask again next time
+    if _url_cache and (image_url or not is_recent(comic_date)):
+        _url_cache.put(comic_url, comic_date, image_url)
+    return image_url
+
+def download_failed(comic_url, comic_date, error):
+    # A cached image URL that now 404s has moved, resolve it again next time
+    if (_url_cache and isinstance(error, requests.HTTPError) and error.response is not None
+            and error.response.status_code in (404, 410)):
+        _url_cache.invalidate(comic_url, comic_date)
+
+def download_image(image_url, file_path, progress=None, cancelled=None, validate=True):
+    # progress(bytes_received, total_bytes_or_None) is called as chunks arrive
+    with get_client().conditional_get(image_url, file_path) as response:
+        if response.status_code == 304:
+            return file_path
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '')
+        if validate and content_type.strip().lower().startswith(NON_IMAGE_TYPES):
+            raise InvalidImage(f"{image_url} returned {content_type}, not an image")
+        total = int(response.headers.get('Content-Length', 0)) or None
+        received = 0
+
+        def check(temp_path):
+            if validate:
+                validate_image(temp_path, received)
+
+        with atomic_write(file_path, before_replace=check, fsync=True) as temp_file:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if cancelled and cancelled():
+                    raise FetchCancelled(image_url)
+                temp_file.write(chunk)
+                received += len(chunk)
+                if progress:
+                    progress(received, total)
+    return file_path
+
+@contextmanager
+def atomic_write(file_path, before_replace=None, fsync=False):
+    # Write next to the target and rename into place, readers only ever see complete files.
+    # The .part suffix keeps the temporary file out of the comic index. before_replace(temp path) runs once
+    # the file is closed and may raise to discard it.
+    folder_path, file_name = os.path.split(file_path)
+    temp_file = tempfile.NamedTemporaryFile('wb', dir=folder_path or None, prefix=f".{file_name}.", suffix=".part", delete=False)
+    try:
+        with temp_file:
+            yield temp_file
+            if fsync:
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+        if before_replace:
+            before_replace(temp_file.name)
+        os.replace(temp_file.name, file_path)
+    except BaseException:
+        if os.path.exists(temp_file.name):
+            os.remove(temp_file.name)
+        raise
+
+def validate_image(file_path, size):
+    if size < MIN_IMAGE_BYTES:
+        raise InvalidImage(f"Downloaded image is only {size} bytes")
+    if Image is None:
+        return
+    try:
+        with Image.open(file_path) as image:
+            image.verify()
+    except Exception as e:
+        raise InvalidImage(f"Downloaded file is not a valid image: {e}")
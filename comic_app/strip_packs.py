@@ -0,0 +1,119 @@
+import io
+import mmap
+import os
+import re
+import struct
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict
+
+# <short_code><yyyy>.cbz, one bundle per comic and year, e.g. ft2024.cbz
+PACK_PATTERN = re.compile(r'^(?P<short_code>.+?)(?P<year>\d{4})\.(?P<ext>cbz|zip)$', re.IGNORECASE)
+PACK_EXTENSIONS = ('.cbz', '.zip')
+
+# Memory maps kept open at once, central directories are cached for every pack
+MAX_OPEN_PACKS = 32
+
+# Fixed part of a ZIP local file header, the name and extra field lengths sit at its end
+LOCAL_HEADER_SIZE = 30
+LOCAL_HEADER_LENGTHS = struct.Struct('<HH')
+
+def pack_name(short_code, year):
+    return f"{short_code}{year}.cbz"
+
+def split_pack_path(file_path):
+    # Strips inside a pack are addressed as <pack path>/<member name>, returns (pack path, member) or None
+    pack_path, member = os.path.split(file_path)
+    if pack_path.lower().endswith(PACK_EXTENSIONS):
+        return pack_path, member
+    return None
+
+class PackCache:
+    def __init__(self, max_open=MAX_OPEN_PACKS):
+        self.max_open = max_open
+        # pack path -> (mtime_ns, {member: (data offset, compressed size, compress type)})
+        self.directories = {}
+        # pack path -> (mtime_ns, mmap), least recently used first
+        self.maps = OrderedDict()
+        self.lock = threading.Lock()
+
+    def members(self, pack_path):
+        with self.lock:
+            return list(self._directory(pack_path))
+
+    def read(self, pack_path, member):
+        with self.lock:
+            offset, size, compress_type = self._directory(pack_path)[member]
+            data = self._map(pack_path)[offset:offset + size]
+        if compress_type == zipfile.ZIP_DEFLATED:
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+        if compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"{member} in {pack_path} uses an unsupported compression method")
+        return data
+
+    def discard(self, pack_path):
+        # Drop cached state before a pack is rewritten or removed, Windows cannot replace a mapped file
+        with self.lock:
+            self.directories.pop(pack_path, None)
+            cached = self.maps.pop(pack_path, None)
+            if cached:
+                cached[1].close()
+
+    def _directory(self, pack_path):
+        # Caller must hold self.lock
+        mtime = os.stat(pack_path).st_mtime_ns
+        cached = self.directories.get(pack_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        # Read the central directory once, then resolve each member to where its bytes start
+        members = {}
+        with open(pack_path, 'rb') as f, zipfile.ZipFile(f) as archive:
+            for info in archive.infolist():
+                # Strips are addressed as <pack path>/<member>, only members at the top of the pack can be read back
+                if info.is_dir() or "/" in info.filename:
+                    continue
+                f.seek(info.header_offset + LOCAL_HEADER_SIZE - LOCAL_HEADER_LENGTHS.size)
+                name_length, extra_length = LOCAL_HEADER_LENGTHS.unpack(f.read(LOCAL_HEADER_LENGTHS.size))
+                offset = info.header_offset + LOCAL_HEADER_SIZE + name_length + extra_length
+                members[info.filename] = (offset, info.compress_size, info.compress_type)
+        self.directories[pack_path] = (mtime, members)
+        return members
+
+    def _map(self, pack_path):
+        # Caller must hold self.lock, the directory was just validated so its mtime is current
+        mtime = self.directories[pack_path][0]
+        cached = self.maps.get(pack_path)
+        if cached and cached[0] == mtime:
+            self.maps.move_to_end(pack_path)
+            return cached[1]
+        if cached:
+            cached[1].close()
+        with open(pack_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.maps[pack_path] = (mtime, mapped)
+        while len(self.maps) > self.max_open:
+            _, (_, evicted) = self.maps.popitem(last=False)
+            evicted.close()
+        return mapped
+
+_packs = PackCache()
+
+def pack_members(pack_path):
+    return _packs.members(pack_path)
+
+def discard_pack(pack_path):
+    _packs.discard(pack_path)
+
+def strip_source(file_path):
+    # What to hand Image.open or send_file: the path of a plain file, an in-memory copy of a pack member
+    parts = split_pack_path(file_path)
+    if parts:
+        return io.BytesIO(_packs.read(*parts))
+    return file_path
+
+def strip_stat(file_path):
+    # Pack members share the pack's stat, repacking changes the mtime and with it every cache key
+    parts = split_pack_path(file_path)
+    return os.stat(parts[0] if parts else file_path)
@@ -0,0 +1,47 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from comic_app.derivatives import DerivativeCache
+
+THUMBNAIL_CACHE_DIR = 'thumbnails'
+THUMBNAIL_WIDTH = 240
+THUMBNAIL_FORMAT = "jpeg"
+
+def month_range(year, month):
+    first = date(year, month, 1)
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return first, last
+
+class Thumbnailer:
+    # Small copies of strips for the month view, kept on disk between runs and trimmed to max_bytes
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR, max_bytes=64 * 1024 * 1024, max_workers=None):
+        self.cache = DerivativeCache(cache_dir, max_bytes)
+        self.max_workers = max_workers
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def month(self, comic_index, short_code, year, month):
+        # (date, strip path, thumbnail path or None) for every available strip of the month
+        first, last = month_range(year, month)
+        strips = comic_index.dates_between(short_code, first, last)
+        thumbnails = self.cache.get_many([file_path for _, file_path in strips], THUMBNAIL_WIDTH, THUMBNAIL_FORMAT, self.get_executor())
+        return [(comic_date, file_path, thumbnails.get(file_path)) for comic_date, file_path in strips]
+
+    def get(self, source_path):
+        return self.cache.get(source_path, THUMBNAIL_WIDTH, THUMBNAIL_FORMAT)
+
+    def get_executor(self):
+        # Decoding full strips is CPU bound, a month's worth is spread over processes instead of threads.
+        # Workers are spawned, forking a process that already runs threads can deadlock the child.
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self.executor
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
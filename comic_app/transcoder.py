@@ -0,0 +1,111 @@
+import argparse
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image
+
+from comic_app.cli import add_settings_argument, load_settings, open_comic_index, rebuild_index_cache
+from comic_app.comic_index import parse_file_name
+from comic_app.strip_fetcher import atomic_write
+
+# Lossless, so the transcoded strip decodes to exactly the BMP's pixels
+TARGET_EXTENSION = "png"
+PNG_OPTIONS = {"compress_level": 9}
+
+def transcode_file(bmp_path):
+    # Runs in a worker process: writes <name>.png next to the BMP, then removes the BMP.
+    # Returns (png path, bytes before, bytes after).
+    png_path = f"{os.path.splitext(bmp_path)[0]}.{TARGET_EXTENSION}"
+    stat = os.stat(bmp_path)
+
+    def check(temp_path):
+        with Image.open(temp_path) as image:
+            image.verify()
+        # Keep the BMP's mtime, the strip has not changed for caches keyed on it
+        os.utime(temp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    with atomic_write(png_path, before_replace=check) as temp_file, Image.open(bmp_path) as image:
+        image.save(temp_file, "PNG", **PNG_OPTIONS)
+    os.remove(bmp_path)
+    return png_path, stat.st_size, os.path.getsize(png_path)
+
+class Transcoder:
+    def __init__(self, folder_path, comic_index=None, max_workers=2):
+        self.folder_path = folder_path
+        self.comic_index = comic_index
+        self.max_workers = max_workers
+        self.counts = {"total": 0, "transcoded": 0, "failed": 0, "bytes_before": 0, "bytes_after": 0}
+
+    def pending(self):
+        # Flat BMP strips, BMPs inside packs or the content store are left as they are
+        bmp_paths = []
+        if not os.path.isdir(self.folder_path):
+            return bmp_paths
+        with os.scandir(self.folder_path) as folder:
+            for entry in folder:
+                parsed = parse_file_name(entry.name)
+                if parsed and parsed[2] == "bmp" and entry.is_file():
+                    bmp_paths.append(entry.path)
+        return bmp_paths
+
+    def run(self, progress=None):
+        bmp_paths = self.pending()
+        self.counts["total"] = len(bmp_paths)
+        if not bmp_paths:
+            return self.counts
+
+        # Workers are spawned, the web app starts the transcoder next to running threads and forking those can deadlock
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {executor.submit(transcode_file, bmp_path): bmp_path for bmp_path in bmp_paths}
+            for future in as_completed(futures):
+                try:
+                    png_path, bytes_before, bytes_after = future.result()
+                except Exception as e:
+                    print(f"Error transcoding {futures[future]}: {e}")
+                    self.counts["failed"] += 1
+                else:
+                    if self.comic_index:
+                        # PNG ranks above BMP, the strip keeps its date and comic in the index
+                        self.comic_index.add(png_path)
+                    self.counts["transcoded"] += 1
+                    self.counts["bytes_before"] += bytes_before
+                    self.counts["bytes_after"] += bytes_after
+                if progress:
+                    progress(self.counts)
+        return self.counts
+
+    def reclaimed(self):
+        return self.counts["bytes_before"] - self.counts["bytes_after"]
+
+    def start(self, on_done=None):
+        # Transcode in the background, on_done(counts) runs on the transcoder thread when finished
+        def run():
+            counts = self.run()
+            if on_done:
+                on_done(counts)
+        thread = threading.Thread(target=run, name="bmp-transcoder", daemon=True)
+        thread.start()
+        return thread
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert BMP strips in the comics folder to lossless PNG.")
+    add_settings_argument(parser)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes")
+    args = parser.parse_args()
+
+    settings, settings_dir = load_settings(args)
+    comic_index = open_comic_index(settings, settings_dir)
+    transcoder = Transcoder(settings["folder_path"], comic_index, args.workers)
+
+    def progress(counts):
+        finished = counts["transcoded"] + counts["failed"]
+        print(f"\r{finished}/{counts['total']} files, {(counts['bytes_before'] - counts['bytes_after']) // 1024} KB reclaimed", end="", flush=True)
+
+    counts = transcoder.run(progress)
+    print(f"\nTranscoded {counts['transcoded']} of {counts['total']} BMP files, {counts['failed']} failed, "
+          f"{transcoder.reclaimed() // 1024} KB reclaimed")
+    rebuild_index_cache(comic_index)
+
+if __name__ == "__main__":
+    main()
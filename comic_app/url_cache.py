@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import threading
+import time
+
+URL_CACHE_FILE = 'url_cache.db'
+
+# A date without a strip may still get one (today's strip, a late upload), so misses are retried after a while
+DEFAULT_NEGATIVE_TTL = 24 * 60 * 60
+
+class UrlCache:
+    def __init__(self, cache_path=URL_CACHE_FILE, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        self.cache_path = cache_path
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS image_url ("
+                " comic_url TEXT NOT NULL,"
+                " comic_date TEXT NOT NULL,"
+                " image_url TEXT,"
+                " resolved_at REAL NOT NULL,"
+                " PRIMARY KEY (comic_url, comic_date))"
+            )
+
+    def get(self, comic_url, comic_date):
+        # Returns (hit, image_url), image_url is None for a cached "no strip on this date"
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT image_url, resolved_at FROM image_url WHERE comic_url = ? AND comic_date = ?",
+                (comic_url, comic_date.isoformat())
+            ).fetchone()
+        if row is None:
+            return False, None
+        image_url, resolved_at = row
+        if image_url is None and time.time() - resolved_at > self.negative_ttl:
+            return False, None
+        return True, image_url
+
+    def put(self, comic_url, comic_date, image_url):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO image_url (comic_url, comic_date, image_url, resolved_at) VALUES (?, ?, ?, ?)",
+                (comic_url, comic_date.isoformat(), image_url, time.time())
+            )
+
+    def invalidate(self, comic_url, comic_date):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM image_url WHERE comic_url = ? AND comic_date = ?",
+                (comic_url, comic_date.isoformat())
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -1,11 +1,10 @@
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from tkcalendar import DateEntry
 from PIL import Image, ImageTk
 import platform
-import requests
 
 from comic_app.settings_manager import SettingsManager, SETTINGS_FILE
 from comic_app.comic_manager import ComicManager
@@ -13,12 +12,15 @@ from comic_app.image_handler import ImageHandler
 from comic_app.date_navigator import DateNavigator
 from comic_app.dialog_change_comic import ChangeComicDialog
 from comic_app.dialog_settings import SettingsDialog
-
-try:
-    from comic_app.image_url_parser import Image_URL_Parser
-    parser_available = True
-except ImportError:
-    parser_available = False
+from comic_app.dialog_month_view import MonthViewDialog
+from comic_app.comic_index import ComicIndex, INDEX_CACHE_FILE, parse_file_name
+from comic_app.blob_store import open_blob_store
+from comic_app.prefetcher import Prefetcher
+from comic_app.thumbnails import Thumbnailer, THUMBNAIL_CACHE_DIR
+from comic_app.async_fetcher import AsyncFetcher
+from comic_app.strip_fetcher import configure_url_cache, parser_available
+from comic_app.url_cache import URL_CACHE_FILE, DEFAULT_NEGATIVE_TTL
+from comic_app.http_client import configure_client
 
 class ComicViewer(tk.Tk):
     def __init__(self):
@@ -31,6 +33,8 @@ class ComicViewer(tk.Tk):
         self.settings         = self.settings_manager.settings
         
         self.comic_manager    = ComicManager(self.settings["comics"], self.user_changed_comic_list_config)
+        configure_client(self.settings)
+        configure_url_cache(URL_CACHE_FILE, self.settings.get("url_negative_ttl", DEFAULT_NEGATIVE_TTL))
 
         self.create_menu()
         
@@ -71,7 +75,10 @@ class ComicViewer(tk.Tk):
         self.create_control_frame()
         self.create_image_display()
         self.create_status_bar()
-        self.image_handler = ImageHandler(self.image_label, self.status_bar)
+        self.image_handler = ImageHandler(self.image_label, self.status_bar, self.settings.get("render_cache_mb", 64))
+        self.prefetcher = Prefetcher(self.image_handler.render_cache, self.settings.get("prefetch_workers", 2))
+        self.async_fetcher = AsyncFetcher(self)
+        self.thumbnailer = Thumbnailer(self.settings.get("thumbnail_cache_dir", THUMBNAIL_CACHE_DIR), self.settings.get("thumbnail_cache_mb", 64) * 1024 * 1024, self.settings.get("thumbnail_workers"))
         self.create_context_menu()
 
     def create_header(self):
@@ -110,6 +117,7 @@ class ComicViewer(tk.Tk):
         self.create_button("Previous Week", self.date_navigator.previous_week)
         self.create_button("Next Month", self.date_navigator.next_month)
         self.create_button("Previous Month", self.date_navigator.previous_month)
+        self.create_button("Month View", self.open_month_view)
         #ttk.Separator(self.control_frame, orient='horizontal').pack(fill=tk.X, pady=10)
 
     def create_image_display(self):
@@ -134,7 +142,7 @@ class ComicViewer(tk.Tk):
             file_path = filedialog.asksaveasfilename(defaultextension=".jpg", filetypes=[("JPEG files", "*.jpg"), ("PNG files", "*.png"), ("All files", "*.*")])
             if file_path:
                 try:
-                    image = self.image_handler.image
+                    image = self.image_handler.full_image()
                     # Convert to RGB if saving as JPEG
                     if file_path.lower().endswith(".jpg") or file_path.lower().endswith(".jpeg"):
                         image = image.convert("RGB")
@@ -145,9 +153,17 @@ class ComicViewer(tk.Tk):
 
     def delete_image(self):
         result = messagebox.askyesno("Delete Image", "Are you sure you want to delete this image?")
-        if result and self.image_handler.current_file_path:
+        file_path = self.image_handler.current_file_path
+        if result and file_path:
             try:
-                os.remove(self.image_handler.current_file_path)
+                # Delete the strip on screen, not whatever date was typed into the date selector since.
+                # Going through the index also covers strips kept in the content store.
+                short_code, comic_date = self.shown_strip
+                comic_index = self.get_comic_index()
+                if comic_index.lookup(short_code, comic_date) != file_path or not comic_index.delete(short_code, comic_date):
+                    self.update_status_bar("Image is no longer in the comics folder, nothing deleted")
+                    return
+                self.image_handler.render_cache.discard(file_path)
                 self.image_handler.clear_image()
                 self.update_status_bar("Image deleted")
             except Exception as e:
@@ -209,26 +225,13 @@ class ComicViewer(tk.Tk):
         self.geometry(f"{width}x{height}+{x}+{y}")
 
     def display_latest_image_from_folder(self):
-        folder_path = self.get_folder_path()
-        short_code  = self.comic_manager.selected_comic["short_code"]
-        latest_file_date = None
-        latest_file_name = None
+        short_code = self.comic_manager.selected_comic["short_code"]
+        latest = self.get_comic_index().latest(short_code)
 
-        for file in os.listdir(folder_path):
-            if short_code in file:
-                try:
-                    date_str = file.replace(short_code, '').split('.')[0]
-                    file_date = datetime.strptime(date_str, "%y%m%d")
-                    if latest_file_date is None or file_date > latest_file_date:
-                        latest_file_date = file_date
-                        latest_file_name = file
-                except ValueError:
-                    continue
-
-        if latest_file_name:
-            file_path = os.path.join(folder_path, latest_file_name)
-            self.image_handler.load_image(file_path)
-            self.update_status_bar(f"Loaded latest comic: {latest_file_name}")
+        if latest:
+            latest_file_date, file_path = latest
+            self.show_strip(short_code, latest_file_date, file_path)
+            self.update_status_bar(f"Loaded latest comic: {os.path.basename(file_path)}")
             self.date_selector.set_date(latest_file_date)
 
     def add_comic(self):
@@ -308,31 +311,42 @@ class ComicViewer(tk.Tk):
             self.header.config(text=self.comic_manager.selected_comic["name"], bg=self.comic_manager.selected_comic["header_bg"], fg=self.comic_manager.selected_comic["header_fg"])
             self.update_status_bar(f"Comic changed to {self.comic_manager.selected_comic['name']}")
 
-    def find_comic(self):
+    def find_comic(self, direction=0):
+        # Any download still running belongs to the date we just left
+        self.async_fetcher.cancel()
         folder_path = self.get_folder_path()
         self.verify_folder_path(folder_path)
 
-        date_str = self.date_selector.get_date().strftime("%y%m%d")
-        file_name_jpg = f"{self.comic_manager.selected_comic['short_code']}{date_str}.jpg"
-        file_name_bmp = f"{self.comic_manager.selected_comic['short_code']}{date_str}.bmp"
-        file_path_jpg = os.path.join(folder_path, file_name_jpg)
-        file_path_bmp = os.path.join(folder_path, file_name_bmp)
-
-        if os.path.exists(file_path_jpg):
-            self.image_handler.load_image(file_path_jpg)
-            self.update_status_bar(f"Loaded comic from {file_path_jpg}")
-        elif os.path.exists(file_path_bmp):
-            self.image_handler.load_image(file_path_bmp)
-            self.update_status_bar(f"Loaded comic from {file_path_bmp}")
+        comic_date = self.date_selector.get_date()
+        date_str = comic_date.strftime("%y%m%d")
+        file_path = self.get_comic_index().lookup(self.comic_manager.selected_comic['short_code'], comic_date)
+
+        if file_path:
+            self.show_strip(self.comic_manager.selected_comic['short_code'], comic_date, file_path)
+            self.update_status_bar(f"Loaded comic from {file_path}")
+            self.prefetcher.prefetch(self.get_comic_index(), self.comic_manager.selected_comic['short_code'], comic_date, direction, self.image_handler.current_window_size())
         else:
+            self.prefetcher.cancel()
+            file_path_jpg = os.path.join(folder_path, f"{self.comic_manager.selected_comic['short_code']}{date_str}.jpg")
             self.download_and_save_comic_image(date_str, folder_path, file_path_jpg)
 
+    def show_strip(self, short_code, comic_date, file_path):
+        # Remember which comic and date is on screen, a stored blob may be shared by several dates
+        self.shown_strip = (short_code, comic_date)
+        self.image_handler.load_image(file_path)
+
     def get_folder_path(self):
         folder_path = self.settings.get("folder_path")
         if not folder_path:
             folder_path = os.path.join(os.path.expanduser("~"), "Pictures", "comics") if platform.system() == "Windows" else os.path.join(os.path.expanduser("~"), "comics")
         return folder_path
 
+    def get_comic_index(self):
+        folder_path = self.get_folder_path()
+        if getattr(self, 'comic_index', None) is None or self.comic_index.folder_path != folder_path:
+            self.comic_index = ComicIndex(folder_path, cache_path=INDEX_CACHE_FILE, blob_store=open_blob_store(folder_path, self.settings))
+        return self.comic_index
+
     def verify_folder_path(self, folder_path):
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
@@ -341,38 +355,28 @@ class ComicViewer(tk.Tk):
     def download_and_save_comic_image(self, date_str, folder_path, file_path_jpg):
         if parser_available:
             self.update_status_bar("Downloading comic image...")
-            comic_name = self.comic_manager.selected_comic["url"]
-            parser = Image_URL_Parser(comic_name)
-            image_url = parser.get_comic_image_url(
-                self.date_selector.get_date().year,
-                f"{self.date_selector.get_date().month:02d}",
-                f"{self.date_selector.get_date().day:02d}"
-            )
-
-            if image_url:
-                self.fetch_image(image_url, file_path_jpg)
-            else:
-                self.handle_image_url_failure()
+            self.image_handler.clear_image()
+            #if self.settings.get("local_saving", True): #TBD, Option to disable local saving
+            self.async_fetcher.fetch(self.comic_manager.selected_comic["url"], self.date_selector.get_date(), file_path_jpg,
+                                     on_progress=self.on_download_progress,
+                                     on_done=self.on_download_done,
+                                     on_url_failure=self.handle_image_url_failure,
+                                     on_error=self.handle_image_download_failure)
         else:
             self.update_status_bar("Image not found locally.")
             self.image_handler.clear_image()
 
-    def fetch_image(self, image_url, file_path_jpg):
-        self.update_status_bar("Fetching image from URL...")
-        try:
-            response = requests.get(image_url, stream=True)
-            response.raise_for_status()
-            #if self.settings.get("local_saving", True): #TBD, Option to disable local saving
-            self.save_image(response, file_path_jpg)
-        except requests.RequestException as e:
-            self.handle_image_download_failure(e)
+    def on_download_progress(self, received, total):
+        if total:
+            self.update_status_bar(f"Downloading comic image... {received // 1024} of {total // 1024} KB")
+        else:
+            self.update_status_bar(f"Downloading comic image... {received // 1024} KB")
 
-    def save_image(self, response, file_path_jpg):
-        with open(file_path_jpg, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
-        self.image_handler.load_image(file_path_jpg)
-        self.update_status_bar(f"Downloaded and saved comic to {file_path_jpg}")
+    def on_download_done(self, file_path_jpg):
+        file_path = self.get_comic_index().add(file_path_jpg)
+        short_code, ordinal, _ = parse_file_name(os.path.basename(file_path_jpg))
+        self.show_strip(short_code, date.fromordinal(ordinal), file_path)
+        self.update_status_bar(f"Downloaded and saved comic to {file_path}")
 
     def handle_image_url_failure(self):
         print("Failed to retrieve the comic image URL.")
@@ -417,7 +421,17 @@ class ComicViewer(tk.Tk):
     def on_date_change(self, event):
         self.find_comic()
 
+    def open_month_view(self):
+        month_view = MonthViewDialog(self, self.thumbnailer, self.get_comic_index(), self.comic_manager.selected_comic['short_code'], self.date_selector.get_date())
+        self.wait_window(month_view.top)
+        if month_view.result:
+            self.date_selector.set_date(month_view.result)
+            self.find_comic()
+
     def on_close(self):
+        self.prefetcher.shutdown()
+        self.async_fetcher.shutdown()
+        self.thumbnailer.shutdown()
         self.save_settings()
         self.destroy()
 
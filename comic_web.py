@@ -1,23 +1,36 @@
 import os
 import logging
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, flash, abort, stream_with_context
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import safe_join
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_bcrypt import Bcrypt
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import inspect
+from sqlalchemy import event, inspect
+import json
+import math
+import multiprocessing
 import secrets
 import threading
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from comic_app.settings_manager import SettingsManager, SETTINGS_FILE
 from comic_app.comic_manager import ComicManager
-
-try:
-    from comic_app.image_url_parser import Image_URL_Parser
-    parser_available = True
-except ImportError:
-    parser_available = False
+from comic_app.job_registry import JobRegistry, FINISHED_STATES
+from comic_app.download_pool import DownloadPool
+from comic_app.comic_index import ComicIndex, INDEX_CACHE_FILE
+from comic_app.blob_store import is_store_path, open_blob_store
+from comic_app.strip_packs import split_pack_path, strip_source, strip_stat
+from comic_app.transcoder import Transcoder
+from comic_app.thumbnails import Thumbnailer, THUMBNAIL_CACHE_DIR, THUMBNAIL_FORMAT, month_range
+from comic_app.backfill import Backfill
+from comic_app.strip_fetcher import InvalidImage, configure_url_cache, download_failed, download_image, parser_available, resolve_image_url
+from comic_app.url_cache import URL_CACHE_FILE, DEFAULT_NEGATIVE_TTL
+from comic_app.derivatives import DerivativeCache, FORMATS, WIDTH_BUCKETS, negotiate_format, snap_width
+from comic_app.http_client import configure_client
+from comic_app.ttl_cache import TTLCache
+from comic_app.login_throttle import PasswordChecker, SlidingWindowLimiter
 
 app = Flask(__name__)
 
@@ -37,9 +50,48 @@ logger.debug(f"Settings file path: {settings_file_path}")
 settings_manager = SettingsManager(settings_file_path)
 settings = settings_manager.settings
 comic_manager = ComicManager(settings.get("comics", []), lambda: None)
+configure_client(settings)
+configure_url_cache(os.path.join(settings_dir, URL_CACHE_FILE), settings.get("url_negative_ttl", DEFAULT_NEGATIVE_TTL))
+
+def get_folder_path():
+    return settings.get("folder_path", os.path.join(os.path.expanduser("~"), "Pictures", "comics"))
+
+# Answers "is this strip on disk" from memory, rescanning only when the folder changes
+comic_index = ComicIndex(get_folder_path(), cache_path=os.path.join(settings_dir, INDEX_CACHE_FILE),
+                         blob_store=open_blob_store(get_folder_path(), settings))
+
+# Per-request image loading jobs, finished jobs expire after job_ttl_seconds
+jobs = JobRegistry(settings.get("job_history_limit", 256), settings.get("job_ttl_seconds", 300))
+LONG_POLL_SECONDS = 25
+EVENT_HEARTBEAT_SECONDS = 15
+PROGRESS_STEP = 32 * 1024
+MAX_RESOLVE_DATES = 62
+MAX_RESOLVE_RANGE_DAYS = 366
+
+# Bounded download workers, concurrent requests for the same strip share one download
+download_pool = DownloadPool(settings.get("download_workers", 4),
+                             settings.get("download_host_limits", {}),
+                             settings.get("download_host_limit", 2))
 
-# Global variable to hold image loading status
-image_status = {"status": "waiting", "file_path": ""}
+# Resized and re-encoded copies of strips for the web UI, so originals (and BMPs) never go to the browser
+derivative_cache = DerivativeCache(settings.get("derivative_cache_dir", os.path.join(settings_dir, "derivatives")),
+                                   settings.get("derivative_cache_mb", 512) * 1024 * 1024)
+
+# Month view thumbnails, generated when /thumbnail is first asked for one and kept on disk across restarts
+thumbnailer = Thumbnailer(settings.get("thumbnail_cache_dir", os.path.join(settings_dir, THUMBNAIL_CACHE_DIR)),
+                          settings.get("thumbnail_cache_mb", 64) * 1024 * 1024)
+
+# BMP originals are converted to lossless PNG in worker processes, opt-in since it rewrites the comics folder.
+# Spawned worker processes import this module again, only the parent starts the transcoder.
+if settings.get("transcode_bmp", False) and multiprocessing.parent_process() is None:
+    def report_transcode(counts):
+        logger.info(f"Transcoded {counts['transcoded']} of {counts['total']} BMP strips, "
+                    f"{(counts['bytes_before'] - counts['bytes_after']) // 1024} KB reclaimed")
+    Transcoder(get_folder_path(), comic_index, settings.get("transcode_workers", 2)).start(report_transcode)
+
+# Running backfills by comic short code, a second request for the same comic joins the running job
+active_backfills = {}
+active_backfills_lock = threading.Lock()
 
 if settings.get("SECRET_KEY", None):
     app.config['SECRET_KEY'] = settings["SECRET_KEY"]
@@ -49,12 +101,38 @@ else:
     settings_manager.save_settings(settings)
 
 db_path = os.getenv('COMIC_USERS_DB_PATH', '')
+# Apache/lighttpd style X-Sendfile, Flask then sends headers only and the server streams the file
+app.config['USE_X_SENDFILE'] = settings.get("use_x_sendfile", False)
+IMAGE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Behind a reverse proxy every request comes from the proxy's address, trust this many X-Forwarded-* hops instead.
+# Only set this when the app is reachable through the proxy alone, the headers are forgeable otherwise.
+trusted_proxies = settings.get("trusted_proxies", 0)
+if trusted_proxies:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies, x_host=trusted_proxies)
+
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(db_path, "users.db")}'
+# Connections are pooled and shared across gunicorn worker threads, a busy database waits instead of failing
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    "connect_args": {"check_same_thread": False, "timeout": settings.get("db_busy_timeout", 15)},
+    "pool_size": settings.get("db_pool_size", 5),
+    "pool_pre_ping": True,
+}
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 bcrypt = Bcrypt(app)
 
+# Logged-in users by id, so authenticated requests (status polls, images) skip the database
+user_cache = TTLCache(settings.get("user_cache_seconds", 30))
+
+# bcrypt is deliberately slow, checks run on a capped pool so login bursts leave the request threads to images
+password_checker = PasswordChecker(bcrypt, settings.get("password_check_workers", 2), settings.get("password_check_queue", 16))
+# Failed logins per client address and per username within login_window_seconds
+LOGIN_WINDOW_SECONDS = settings.get("login_window_seconds", 300)
+ip_login_limiter = SlidingWindowLimiter(settings.get("login_attempts_per_ip", 20), LOGIN_WINDOW_SECONDS)
+user_login_limiter = SlidingWindowLimiter(settings.get("login_attempts_per_user", 5), LOGIN_WINDOW_SECONDS)
+
 # User model for the database
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -63,6 +141,14 @@ class User(UserMixin, db.Model):
 
 # Initialize the database and create an admin user if necessary
 with app.app_context():
+    @event.listens_for(db.engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets readers run alongside a writer, NORMAL sync is safe with WAL and avoids an fsync per commit
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
     inspector = inspect(db.engine)
     if not inspector.has_table('user'):
         db.create_all()
@@ -93,85 +179,99 @@ with app.app_context():
             logger.info(f'Username: {admin_user.username}, Password: {admin_password}')
             logger.info(f'Please change the default password!')
 
-def download_and_save_comic_image(date_str, folder_path, file_path_jpg):
-    global image_status
+def download_and_save_comic_image(notify, comic, comic_date, file_path_jpg):
     if parser_available:
         logger.debug("Downloading comic image...")
-        image_status["status"] = "Downloading comic image..."
-        comic_name = comic_manager.selected_comic["url"]
-        parser = Image_URL_Parser(comic_name)
-        image_url = parser.get_comic_image_url(
-            int(date_str[:2]) + 2000,  # year
-            date_str[2:4],            # month
-            date_str[4:]              # day
-        )
+        notify(status="Finding comic image URL...", state="parsing")
+        image_url = resolve_image_url(comic["url"], comic_date)
         if image_url:
             logger.debug("Parse success, fetch image to save.")
-            fetch_image(image_url, file_path_jpg)
-            return
-    image_status["status"] = "failure"
+            return fetch_image(notify, comic, comic_date, image_url, file_path_jpg)
+    return None
+
+def fetch_image(notify, comic, comic_date, image_url, file_path_jpg):
+    last_reported = [0]
+    def progress(received, total):
+        if received - last_reported[0] >= PROGRESS_STEP or received == total:
+            last_reported[0] = received
+            notify(status=f"Downloading comic image... {received // 1024} KB", state="downloading", received=received, total=total)
 
-def fetch_image(image_url, file_path_jpg):
-    global image_status
     try:
-        response = requests.get(image_url, stream=True)
-        response.raise_for_status()
-        save_image(response, file_path_jpg)
-    except requests.RequestException as e:
+        with download_pool.host_slot(image_url):
+            download_image(image_url, file_path_jpg, progress)
+    except (requests.RequestException, InvalidImage) as e:
         logger.error(f"Failed to fetch image: {e}")
-        image_status["status"] = "failure"
-
-def save_image(response, file_path_jpg):
-    global image_status
-    with open(file_path_jpg, 'wb') as file:
-        for chunk in response.iter_content(chunk_size=8192):
-            file.write(chunk)
-        image_status["file_path"] = file_path_jpg
-        image_status["status"] = "success"
-        logger.debug(f"Downloaded and saved comic to {file_path_jpg}")
-
-def load_comic_image(selected_comic, selected_date, folder_path):
-    global image_status
-    image_status["status"] = f"Loading comic image: {selected_comic} for {selected_date} from {folder_path}."
-    
-    if selected_comic != comic_manager.selected_comic['name']:
-        image_status["status"] = "Comic change in progress"
-        comic_manager.load_comic_details(selected_comic)
-    
-    date_str = datetime.strptime(selected_date, "%Y-%m-%d").strftime("%y%m%d")
-    file_path_jpg = os.path.join(folder_path, f"{comic_manager.selected_comic['short_code']}{date_str}.jpg")
-    file_path_bmp = os.path.join(folder_path, f"{comic_manager.selected_comic['short_code']}{date_str}.bmp")
-
-    if os.path.exists(file_path_jpg):
-        logger.debug(f"Path exists: {file_path_jpg}")
-        image_status["file_path"] = file_path_jpg
-        image_status["status"] = "success"
-    elif os.path.exists(file_path_bmp):
-        logger.debug(f"Path exists: {file_path_bmp}")
-        image_status["file_path"] = file_path_bmp
-        image_status["status"] = "success"
+        download_failed(comic["url"], comic_date, e)
+        return None
+    file_path = comic_index.add(file_path_jpg)
+    logger.debug(f"Downloaded and saved comic to {file_path}")
+    return file_path
+
+def load_comic_image(notify, comic, comic_date, folder_path):
+    notify(status=f"Loading comic image: {comic['name']} for {comic_date} from {folder_path}.", state="loading")
+
+    file_path = comic_index.lookup(comic['short_code'], comic_date)
+    if file_path:
+        logger.debug(f"Path exists: {file_path}")
+        return file_path
+
+    logger.debug("No image found, attempt to download")
+    date_str = comic_date.strftime("%y%m%d")
+    file_path_jpg = os.path.join(folder_path, f"{comic['short_code']}{date_str}.jpg")
+    return download_and_save_comic_image(notify, comic, comic_date, file_path_jpg)
+
+def finish_job(job_id, future):
+    try:
+        file_path = future.result()
+    except Exception as e:
+        logger.error(f"Image load failed: {e}")
+        file_path = None
+    if file_path:
+        jobs.update(job_id, status="success", file_path=file_path)
     else:
-        logger.debug("No image found, attempt to download")
-        download_and_save_comic_image(date_str, folder_path, file_path_jpg)
+        jobs.update(job_id, status="failure")
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user = user_cache.get(user_id)
+    if user is None:
+        user = db.session.get(User, int(user_id))
+        if user is not None:
+            # Detach the loaded user so the cached copy outlives this request's session
+            db.session.expunge(user)
+            user_cache.put(user_id, user)
+    return user
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
+        user_key = username.lower()
+        retry_after = max(ip_login_limiter.retry_after(request.remote_addr), user_login_limiter.retry_after(user_key))
+        if retry_after:
+            flash('Too many login attempts, please try again later.', 'danger')
+            return render_template('login.html'), 429, {"Retry-After": str(math.ceil(retry_after))}
+
         user = User.query.filter_by(username=username).first()
-        if user and bcrypt.check_password_hash(user.password, password):
+        valid = password_checker.check(user.password, password) if user else False
+        if valid is None:
+            return password_checker_busy('login.html')
+        if valid:
+            user_login_limiter.reset(user_key)
             login_user(user)
             flash('Login successful!', 'success')
             return redirect(url_for('comic_viewer'))
         else:
+            ip_login_limiter.record(request.remote_addr)
+            user_login_limiter.record(user_key)
             flash('Login unsuccessful. Please check username and password', 'danger')
     return render_template('login.html')
 
+def password_checker_busy(template):
+    flash('Server is busy, please try again.', 'danger')
+    return render_template(template), 503, {"Retry-After": "1"}
+
 @app.route('/logout')
 @login_required
 def logout():
@@ -187,14 +287,29 @@ def change_password():
         new_password = request.form['new_password']
         confirm_password = request.form['confirm_password']
         
-        if not bcrypt.check_password_hash(current_user.password, current_password):
+        user_key = current_user.username.lower()
+        retry_after = user_login_limiter.retry_after(user_key)
+        if retry_after:
+            flash('Too many attempts, please try again later.', 'danger')
+            return render_template('change_password.html'), 429, {"Retry-After": str(math.ceil(retry_after))}
+
+        # current_user may be a cached, detached copy, load the user into this session before changing it
+        user = db.session.get(User, current_user.id)
+        valid = password_checker.check(user.password, current_password)
+        if valid is None:
+            return password_checker_busy('change_password.html')
+        if not valid:
+            user_login_limiter.record(user_key)
             flash('Current password is incorrect.', 'danger')
         elif new_password != confirm_password:
             flash('New passwords do not match.', 'danger')
         else:
-            hashed_password = bcrypt.generate_password_hash(new_password).decode('utf-8')
-            current_user.password = hashed_password
+            hashed_password = password_checker.generate(new_password)
+            if hashed_password is None:
+                return password_checker_busy('change_password.html')
+            user.password = hashed_password.decode('utf-8')
             db.session.commit()
+            user_cache.invalidate(current_user.get_id())
             flash('Password changed successfully.', 'success')
             return redirect(url_for('comic_viewer'))
     
@@ -208,39 +323,315 @@ def comic_viewer():
         return redirect(url_for('comic_viewer'))
 
     logger.debug(f"Comics list to html: {comic_manager.comics}")
-    return render_template('index.html', comics=comic_manager.comics)
+    return render_template('index.html', comics=comic_manager.comics, variant_buckets=WIDTH_BUCKETS)
 
 @app.route('/request_image', methods=['POST'])
 @login_required
 def request_image():
-    global image_status
-    image_status["status"] = "waiting"
     selected_comic = request.json.get('comic')
     selected_date = request.json.get('date')
+
+    # Look the comic up without touching comic_manager.selected_comic, which is shared by every request
+    comic = comic_manager.get_comic(selected_comic)
+    if comic is None:
+        return jsonify({"status": "failure", "error": f"Unknown comic: {selected_comic}"}), 404
+    try:
+        comic_date = datetime.strptime(selected_date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return jsonify({"status": "failure", "error": f"Invalid date: {selected_date}"}), 400
     
-    folder_path = settings.get("folder_path", os.path.join(os.path.expanduser("~"), "Pictures", "comics"))
+    folder_path = get_folder_path()
     
     if not os.path.exists(folder_path):
         os.makedirs(folder_path)
+
+    # Strip already on disk: answer inline, no job and no status round trip
+    file_path = comic_index.lookup(comic['short_code'], comic_date)
+    if file_path:
+        logger.debug(f"Path exists: {file_path}")
+        return jsonify(dict(image_payload(comic['short_code'], comic_date, file_path), status="success", state="success")), 200
     
-    threading.Thread(target=load_comic_image, args=(selected_comic, selected_date, folder_path)).start()
+    job_id = jobs.create(owner=current_user.get_id(), short_code=comic['short_code'], comic_date=comic_date)
+    future = download_pool.submit((comic['short_code'], comic_date), load_comic_image, comic, comic_date, folder_path,
+                                  listener=lambda **fields: jobs.update(job_id, **fields))
+    future.add_done_callback(lambda future: finish_job(job_id, future))
     
-    return jsonify({"status": "loading"}), 202
+    return jsonify({"status": "loading", "job_id": job_id}), 202
 
-@app.route('/status', methods=['GET'])
+@app.route('/resolve', methods=['POST'])
 @login_required
-def status():
-    global image_status
-    if image_status["status"] == "success":
-        return jsonify({"status": "success", "file_path": url_for('serve_image', filename=os.path.basename(image_status["file_path"]))})
-    return jsonify({"status": image_status["status"]})
+def resolve_images():
+    # Resolve several dates of one comic in a single call, used by the page to prefetch neighbouring strips
+    comic = comic_manager.get_comic(request.json.get('comic'))
+    if comic is None:
+        return jsonify({"status": "failure", "error": f"Unknown comic: {request.json.get('comic')}"}), 404
+    selected_dates = request.json.get('dates')
+    if not isinstance(selected_dates, list) or len(selected_dates) > MAX_RESOLVE_DATES:
+        return jsonify({"status": "failure", "error": f"dates must be a list of at most {MAX_RESOLVE_DATES} dates"}), 400
+
+    folder_path = get_folder_path()
+    images = {}
+    for selected_date in selected_dates:
+        try:
+            comic_date = datetime.strptime(selected_date, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            return jsonify({"status": "failure", "error": f"Invalid date: {selected_date}"}), 400
+        file_path = comic_index.lookup(comic['short_code'], comic_date)
+        images[selected_date] = image_payload(comic['short_code'], comic_date, file_path) if file_path else None
+        if file_path is None and request.json.get('fetch') and comic_date <= datetime.now().date():
+            # Start the download now, a later /request_image for this date joins it
+            download_pool.submit((comic['short_code'], comic_date), load_comic_image, comic, comic_date, folder_path)
+    return jsonify({"status": "success", "images": images})
+
+@app.route('/resolve_range', methods=['POST'])
+@login_required
+def resolve_range():
+    # Which strips of several comics are on disk between start and end, for calendar views and bulk prefetching
+    selected_comics = request.json.get('comics')
+    if not isinstance(selected_comics, list) or not selected_comics:
+        return jsonify({"status": "failure", "error": "comics must be a non-empty list of comic names"}), 400
+    comics = []
+    for selected_comic in selected_comics:
+        comic = comic_manager.get_comic(selected_comic)
+        if comic is None:
+            return jsonify({"status": "failure", "error": f"Unknown comic: {selected_comic}"}), 404
+        comics.append(comic)
+    try:
+        start_date = datetime.strptime(request.json.get('start'), "%Y-%m-%d").date()
+        end_date = datetime.strptime(request.json.get('end'), "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return jsonify({"status": "failure", "error": "start and end must be YYYY-MM-DD dates"}), 400
+    if end_date < start_date:
+        return jsonify({"status": "failure", "error": "end is before start"}), 400
+    if (end_date - start_date).days >= MAX_RESOLVE_RANGE_DAYS:
+        return jsonify({"status": "failure", "error": f"Range is limited to {MAX_RESOLVE_RANGE_DAYS} days"}), 400
+
+    # Strips for future dates do not exist yet, they are neither missing nor fetched
+    last_date = min(end_date, datetime.now().date())
+    results = {}
+    missing = []
+    for comic in comics:
+        present = {comic_date.isoformat(): image_payload(comic['short_code'], comic_date, file_path)
+                   for comic_date, file_path in comic_index.dates_between(comic['short_code'], start_date, end_date)}
+        missing_dates = [start_date + timedelta(days=offset) for offset in range((last_date - start_date).days + 1)]
+        missing_dates = [comic_date for comic_date in missing_dates if comic_date.isoformat() not in present]
+        results[comic['name']] = {"present": present, "missing": [comic_date.isoformat() for comic_date in missing_dates]}
+        missing.extend((comic, comic_date) for comic_date in missing_dates)
+
+    response = {"status": "success", "comics": results}
+    if request.json.get('fetch') and missing:
+        job_id = jobs.create(owner=current_user.get_id())
+        fetch_batch(job_id, missing, get_folder_path())
+        response["job_id"] = job_id
+    return jsonify(response)
+
+def fetch_batch(job_id, missing, folder_path):
+    # Every missing strip goes through the download pool, one job reports progress for the whole batch
+    counts = {"total": len(missing), "fetched": 0, "failed": 0}
+    counts_lock = threading.Lock()
+
+    def strip_done(future):
+        try:
+            file_path = future.result()
+        except Exception as e:
+            logger.error(f"Image load failed: {e}")
+            file_path = None
+        with counts_lock:
+            counts["fetched" if file_path else "failed"] += 1
+            finished = counts["fetched"] + counts["failed"]
+            progress = dict(counts)
+        if finished == progress["total"]:
+            jobs.update(job_id, status="success", progress=progress)
+        else:
+            jobs.update(job_id, status=f"Fetched {finished}/{progress['total']} strips", progress=progress)
+
+    jobs.update(job_id, status=f"Fetched 0/{counts['total']} strips", progress=dict(counts))
+    for comic, comic_date in missing:
+        future = download_pool.submit((comic['short_code'], comic_date), load_comic_image, comic, comic_date, folder_path)
+        future.add_done_callback(strip_done)
+
+@app.route('/calendar', methods=['GET'])
+@login_required
+def calendar():
+    # Every available strip of one comic in a month. Answers straight from the index, the browser then
+    # fetches each thumbnail from /thumbnail, which makes it on first request.
+    comic = comic_manager.get_comic(request.args.get('comic'))
+    if comic is None:
+        return jsonify({"status": "failure", "error": f"Unknown comic: {request.args.get('comic')}"}), 404
+    try:
+        month_start = datetime.strptime(request.args.get('month'), "%Y-%m").date()
+    except (TypeError, ValueError):
+        return jsonify({"status": "failure", "error": "month must be YYYY-MM"}), 400
+
+    days = []
+    for comic_date, file_path in comic_index.dates_between(comic['short_code'], *month_range(month_start.year, month_start.month)):
+        day = dict(image_payload(comic['short_code'], comic_date, file_path), date=comic_date.isoformat())
+        day["thumbnail_path"] = url_for('serve_thumbnail', filename=comic_index.served_name(comic['short_code'], comic_date, file_path))
+        days.append(day)
+    return jsonify({"status": "success", "month": month_start.strftime("%Y-%m"), "days": days})
+
+@app.route('/status/<job_id>', methods=['GET'])
+@login_required
+def status(job_id):
+    # ?wait=<version> turns this into a long-poll that returns once the job changes
+    wait_version = request.args.get('wait', type=int)
+    if wait_version is not None:
+        job = jobs.wait(job_id, wait_version, LONG_POLL_SECONDS, owner=current_user.get_id())
+    else:
+        job = jobs.get(job_id, owner=current_user.get_id())
+    if job is None:
+        return jsonify({"status": "failure", "error": "Unknown or expired job"}), 404
+    return jsonify(job_payload(job))
+
+@app.route('/events/<job_id>', methods=['GET'])
+@login_required
+def job_events(job_id):
+    # Server-Sent Events: one held connection delivers every state change of the job
+    owner = current_user.get_id()
+    if jobs.get(job_id, owner=owner) is None:
+        return jsonify({"status": "failure", "error": "Unknown or expired job"}), 404
+
+    def stream():
+        sent_version = None
+        job = jobs.get(job_id, owner=owner)
+        while job is not None:
+            if job["version"] != sent_version:
+                sent_version = job["version"]
+                yield f"data: {json.dumps(job_payload(job))}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if job["finished_at"] is not None:
+                break
+            job = jobs.wait(job_id, sent_version, EVENT_HEARTBEAT_SECONDS, owner=owner)
+
+    return app.response_class(stream_with_context(stream()), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def image_payload(short_code, comic_date, file_path):
+    file_name = comic_index.served_name(short_code, comic_date, file_path)
+    return {"file_path": url_for('serve_image', filename=file_name), "variant_path": url_for('serve_variant', filename=file_name)}
+
+def job_payload(job):
+    response = {"status": job["status"], "state": job.get("state", "waiting"), "version": job["version"]}
+    if job["status"] in FINISHED_STATES:
+        response["state"] = job["status"]
+    if job["status"] == "success" and job["file_path"]:
+        response.update(image_payload(job["short_code"], job["comic_date"], job["file_path"]))
+    for key in ("received", "total", "progress"):
+        if key in job:
+            response[key] = job[key]
+    return response
+
+def run_backfill(job_id, short_code, backfill):
+    try:
+        counts = backfill.run()
+        jobs.update(job_id, status="success", progress=counts)
+    except Exception as e:
+        logger.error(f"Backfill failed: {e}")
+        jobs.update(job_id, status="failure")
+    finally:
+        with active_backfills_lock:
+            active_backfills.pop(short_code, None)
+
+@app.route('/backfill', methods=['POST'])
+@login_required
+def backfill():
+    comic = comic_manager.get_comic(request.json.get('comic'))
+    if comic is None:
+        return jsonify({"status": "failure", "error": f"Unknown comic: {request.json.get('comic')}"}), 404
+    try:
+        start_date = datetime.strptime(request.json.get('start'), "%Y-%m-%d").date()
+        end_date = datetime.strptime(request.json.get('end'), "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return jsonify({"status": "failure", "error": "start and end must be YYYY-MM-DD dates"}), 400
+    if end_date < start_date:
+        return jsonify({"status": "failure", "error": "end is before start"}), 400
+
+    with active_backfills_lock:
+        job_id = active_backfills.get(comic['short_code'])
+        if job_id and jobs.get(job_id):
+            return jsonify({"status": "loading", "job_id": job_id}), 202
+
+        job_id = jobs.create(owner=current_user.get_id())
+        active_backfills[comic['short_code']] = job_id
+
+    def progress(counts):
+        finished = counts["fetched"] + counts["unavailable"] + counts["failed"]
+        jobs.update(job_id, status=f"Backfilling {comic['name']}: {finished}/{counts['total']} dates", progress=counts)
+
+    comic_backfill = Backfill(comic, start_date, end_date, get_folder_path(), settings_dir, comic_index,
+                              max_workers=settings.get("backfill_workers", 4),
+                              requests_per_second=settings.get("backfill_requests_per_second", 1.0),
+                              retry_unavailable=bool(request.json.get('retry_unavailable')), progress=progress)
+    threading.Thread(target=run_backfill, args=(job_id, comic['short_code'], comic_backfill), daemon=True).start()
+
+    return jsonify({"status": "loading", "job_id": job_id}), 202
 
 @app.route('/image/<path:filename>', methods=['GET'])
 @login_required
 def serve_image(filename):
-    folder_path = settings.get("folder_path", os.path.join(os.path.expanduser("~"), "Pictures", "comics"))
-    logger.debug(f"Sending {os.path.join(folder_path, filename)}")
-    return send_file(os.path.join(folder_path, filename))
+    folder_path = get_folder_path()
+    file_path = image_source_path(filename)
+    logger.debug(f"Sending {file_path}")
+
+    if split_pack_path(file_path):
+        # Strips inside a pack are read from the mapped pack, the proxy cannot reach into it
+        stat = strip_stat(file_path)
+        file_name = os.path.basename(file_path)
+        response = send_file(strip_source(file_path), download_name=file_name, conditional=True,
+                             etag=f"{stat.st_mtime_ns}-{file_name}", last_modified=stat.st_mtime, max_age=IMAGE_MAX_AGE)
+        return immutable_response(response)
+
+    accel_prefix = settings.get("x_accel_redirect_prefix")
+    if accel_prefix:
+        # Let the front proxy (nginx) send the bytes, it handles conditional and range requests itself
+        relative_path = os.path.relpath(file_path, folder_path).replace(os.sep, '/')
+        response = app.response_class()
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{relative_path}"
+        return immutable_response(response)
+
+    # conditional=True answers If-None-Match/If-Modified-Since with 304 and Range with 206
+    response = send_file(file_path, conditional=True, etag=True, max_age=IMAGE_MAX_AGE)
+    return immutable_response(response)
+
+@app.route('/variant/<path:filename>', methods=['GET'])
+@login_required
+def serve_variant(filename):
+    source_path = image_source_path(filename)
+
+    width = snap_width(request.args.get('w', WIDTH_BUCKETS[-1], type=int))
+    format_name = negotiate_format(request.headers.get('Accept'), request.args.get('fmt'))
+    file_path = derivative_cache.get(source_path, width, format_name)
+    logger.debug(f"Sending {file_path}")
+
+    response = send_file(file_path, mimetype=FORMATS[format_name][1], conditional=True, etag=True, max_age=IMAGE_MAX_AGE)
+    response.vary.add('Accept')
+    return immutable_response(response)
+
+@app.route('/thumbnail/<path:filename>', methods=['GET'])
+@login_required
+def serve_thumbnail(filename):
+    file_path = thumbnailer.get(image_source_path(filename))
+    response = send_file(file_path, mimetype=FORMATS[THUMBNAIL_FORMAT][1], conditional=True, etag=True, max_age=IMAGE_MAX_AGE)
+    return immutable_response(response)
+
+def image_source_path(filename):
+    # Flat files are served as they are, strips kept in the content store resolve through the index by name
+    file_path = safe_join(get_folder_path(), filename)
+    if file_path is not None and not is_store_path(filename) and os.path.isfile(file_path):
+        return file_path
+    file_path = comic_index.resolve_name(filename) if '/' not in filename else None
+    if file_path is None:
+        abort(404)
+    return file_path
+
+def immutable_response(response):
+    # A strip for a given date never changes, browsers may reuse it without revalidating
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = IMAGE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from datetime import date
+
+from comic_app.comic_index import ComicIndex
+from comic_app.strip_packs import strip_source
+
+class ComicIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def write(self, *parts):
+        file_path = os.path.join(self.folder, *parts)
+        with open(file_path, "wb") as f:
+            f.write(b"strip")
+        return file_path
+
+    def test_own_add_keeps_other_writers_visible(self):
+        self.write("ft210101.jpg")
+        comic_index = ComicIndex(self.folder, refresh_interval=0)
+        self.assertIsNotNone(comic_index.lookup("ft", date(2021, 1, 1)))
+
+        # Another process writes a strip, then this one writes and registers its own
+        self.write("ft210102.jpg")
+        comic_index.add(self.write("ft210103.jpg"))
+
+        self.assertIsNotNone(comic_index.lookup("ft", date(2021, 1, 3)))
+        self.assertIsNotNone(comic_index.lookup("ft", date(2021, 1, 2)))
+
+    def test_pack_members_in_subfolders_are_skipped(self):
+        with zipfile.ZipFile(os.path.join(self.folder, "ft2020.zip"), "w") as archive:
+            archive.writestr("ft200101.jpg", b"top")
+            archive.writestr("sub/ft200102.jpg", b"nested")
+        comic_index = ComicIndex(self.folder, refresh_interval=0)
+
+        self.assertEqual(comic_index.short_codes(), ["ft"])
+        self.assertIsNone(comic_index.lookup("ft", date(2020, 1, 2)))
+        with strip_source(comic_index.lookup("ft", date(2020, 1, 1))) as strip:
+            self.assertEqual(strip.read(), b"top")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PIL import Image
+import requests
+
+from comic_app.http_client import HttpClient, configure_client
+from comic_app.strip_fetcher import InvalidImage, download_image
+
+def jpeg_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 32), (200, 40, 40)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+STRIP = jpeg_bytes()
+ETAG = '"strip-1"'
+
+class StripHandler(BaseHTTPRequestHandler):
+    # Stand-in for a comic CDN, each path exercises one response the fetch layer has to handle
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, dict(self.headers)))
+        if self.path == "/strip.jpg":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_body(STRIP, "image/jpeg", {"ETag": ETAG})
+        elif self.path == "/octet":
+            self.send_body(STRIP, "application/octet-stream")
+        elif self.path == "/page.html":
+            self.send_body(b"<html>" + b"x" * 256 + b"</html>", "text/html; charset=utf-8")
+        elif self.path == "/truncated.jpg":
+            # Promise the whole strip, send half of it and hang up
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(STRIP)))
+            self.end_headers()
+            self.wfile.write(STRIP[:len(STRIP) // 2])
+            self.close_connection = True
+        else:
+            self.send_error(404)
+
+    def send_body(self, body, content_type, headers=None):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class HttpClientTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StripHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StripHandler.requests_seen.clear()
+        self.folder = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.folder, "ft240101.jpg")
+        self.client = configure_client({"http_timeout": [2, 5]})
+
+    def tearDown(self):
+        self.client.close()
+        shutil.rmtree(self.folder)
+
+    def assert_no_partial_files(self):
+        self.assertEqual([name for name in os.listdir(self.folder) if name.endswith(".part")], [])
+
+    def test_download_writes_the_strip(self):
+        download_image(f"{self.base_url}/strip.jpg", self.file_path)
+        with open(self.file_path, 'rb') as f:
+            self.assertEqual(f.read(), STRIP)
+        self.assert_no_partial_files()
+
+    def test_second_download_revalidates_with_304(self):
+        download_image(f"{self.base_url}/strip.jpg", self.file_path)
+        mtime = os.stat(self.file_path).st_mtime_ns
+        download_image(f"{self.base_url}/strip.jpg", self.file_path)
+
+        _, headers = StripHandler.requests_seen[-1]
+        self.assertEqual(headers.get("If-None-Match"), ETAG)
+        self.assertIn("If-Modified-Since", headers)
+        self.assertEqual(os.stat(self.file_path).st_mtime_ns, mtime)
+
+    def test_conditional_get_without_local_copy_sends_no_validators(self):
+        client = HttpClient(timeout=(2, 5))
+        try:
+            with client.conditional_get(f"{self.base_url}/strip.jpg", self.file_path) as response:
+                self.assertEqual(response.status_code, 200)
+        finally:
+            client.close()
+        _, headers = StripHandler.requests_seen[-1]
+        self.assertNotIn("If-None-Match", headers)
+        self.assertNotIn("If-Modified-Since", headers)
+
+    def test_octet_stream_is_judged_by_its_content(self):
+        download_image(f"{self.base_url}/octet", self.file_path)
+        with Image.open(self.file_path) as image:
+            self.assertEqual(image.format, "JPEG")
+
+    def test_html_is_rejected(self):
+        with self.assertRaises(InvalidImage):
+            download_image(f"{self.base_url}/page.html", self.file_path)
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assert_no_partial_files()
+
+    def test_truncated_body_leaves_nothing_behind(self):
+        with self.assertRaises((requests.RequestException, InvalidImage)):
+            download_image(f"{self.base_url}/truncated.jpg", self.file_path)
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assert_no_partial_files()
+
+    def test_missing_strip_raises_http_error(self):
+        with self.assertRaises(requests.HTTPError):
+            download_image(f"{self.base_url}/missing.jpg", self.file_path)
+        self.assertFalse(os.path.exists(self.file_path))
+
+if __name__ == "__main__":
+    unittest.main()